@@ -11,6 +11,8 @@ sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..'
 
 from app.database import Base
 from app.models.user import User  
+from app.models.idempotency import IdempotencyKey
+from app.models.archive import UserArchive
 from app.config import get_settings
 
 # this is the Alembic Config object, which provides
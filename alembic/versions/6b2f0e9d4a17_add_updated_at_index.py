@@ -0,0 +1,34 @@
+"""Add updated_at index
+
+Revision ID: 6b2f0e9d4a17
+Revises: 0986c94c27fa
+Create Date: 2026-10-18 01:20:14.532870
+
+idx_updated_at_id serves changed-since reads on updated_at: the
+autocomplete catch-up, which every worker runs every
+AUTOCOMPLETE_REFRESH_SECONDS, and the keyset seek of GET /users/changes in
+(updated_at, id) order without a sort. Creates, updates and soft deletes
+all set updated_at. Rows that never got one fall back to created_at, so
+the feed's first pass includes them.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2f0e9d4a17'
+down_revision: Union[str, None] = '0986c94c27fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE users SET updated_at = created_at WHERE updated_at IS NULL")
+    op.create_index('idx_updated_at_id', 'users', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_updated_at_id', table_name='users')
@@ -0,0 +1,61 @@
+"""Add email_domain column and full-text search indexes
+
+Revision ID: 8e2d4b1c7f30
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-18 11:02:17.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2d4b1c7f30'
+down_revision: Union[str, None] = '3c1f9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "name, email, content='users', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.rowid, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF name, email ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.rowid, old.name, old.email); "
+    "INSERT INTO users_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    op.add_column('users', sa.Column('email_domain', sa.String(length=255), nullable=True, comment='Lower-cased domain part of email, for domain search'))
+    if dialect == 'mysql':
+        op.execute("UPDATE users SET email_domain = LOWER(SUBSTRING_INDEX(email, '@', -1))")
+    else:
+        op.execute("UPDATE users SET email_domain = LOWER(SUBSTR(email, INSTR(email, '@') + 1))")
+    op.create_index(op.f('ix_users_email_domain'), 'users', ['email_domain'], unique=False)
+
+    if dialect == 'mysql':
+        op.create_index('ft_users_name_email', 'users', ['name', 'email'], unique=False,
+                        mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ft_users_name_email', table_name='users')
+    elif dialect == 'sqlite':
+        for trigger in ('users_fts_ai', 'users_fts_ad', 'users_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS users_fts")
+    op.drop_index(op.f('ix_users_email_domain'), table_name='users')
+    op.drop_column('users', 'email_domain')
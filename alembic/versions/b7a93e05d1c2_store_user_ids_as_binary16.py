@@ -0,0 +1,83 @@
+"""Store user ids as BINARY(16)
+
+Revision ID: b7a93e05d1c2
+Revises: 8e2d4b1c7f30
+Create Date: 2026-10-18 13:40:52.118406
+
+Converts users.id and idempotency_keys.user_id from CHAR(36) strings to
+16-byte binary UUIDs. Existing ids keep their value; only ids generated
+from now on are time-ordered (USER_ID_SCHEME=uuid7). Requires MySQL 8.0
+for UUID_TO_BIN/BIN_TO_UUID.
+
+On SQLite, whose column types are only affinities, the stored values are
+converted in place instead. Rebuilding users with batch_alter_table would
+drop the users_fts triggers and could renumber the rowids the full-text
+index refers to.
+
+"""
+from typing import Sequence, Union
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7a93e05d1c2'
+down_revision: Union[str, None] = '8e2d4b1c7f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def convert_sqlite_ids(to_value) -> None:
+    """Rewrite each stored users.id and idempotency_keys.user_id with to_value."""
+    bind = op.get_bind()
+    for table, column in (('users', 'id'), ('idempotency_keys', 'user_id')):
+        rows = bind.execute(sa.text(f"SELECT DISTINCT {column} FROM {table}")).scalars().all()
+        for value in rows:
+            bind.execute(
+                sa.text(f"UPDATE {table} SET {column} = :new WHERE {column} = :old"),
+                {'new': to_value(value), 'old': value}
+            )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        convert_sqlite_ids(lambda value: uuid.UUID(value).bytes)
+        return
+
+    op.execute("ALTER TABLE users ADD COLUMN id_bin BINARY(16) NULL")
+    op.execute("UPDATE users SET id_bin = UUID_TO_BIN(id)")
+    op.execute(
+        "ALTER TABLE users DROP PRIMARY KEY, DROP COLUMN id, "
+        "CHANGE id_bin id BINARY(16) NOT NULL FIRST, ADD PRIMARY KEY (id)"
+    )
+
+    op.execute("ALTER TABLE idempotency_keys ADD COLUMN user_id_bin BINARY(16) NULL")
+    op.execute("UPDATE idempotency_keys SET user_id_bin = UUID_TO_BIN(user_id)")
+    op.execute(
+        "ALTER TABLE idempotency_keys DROP COLUMN user_id, "
+        "CHANGE user_id_bin user_id BINARY(16) NOT NULL "
+        "COMMENT 'User created by the original request' AFTER `key`"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        convert_sqlite_ids(lambda value: str(uuid.UUID(bytes=bytes(value))))
+        return
+
+    op.execute("ALTER TABLE idempotency_keys ADD COLUMN user_id_str VARCHAR(36) NULL")
+    op.execute("UPDATE idempotency_keys SET user_id_str = BIN_TO_UUID(user_id)")
+    op.execute(
+        "ALTER TABLE idempotency_keys DROP COLUMN user_id, "
+        "CHANGE user_id_str user_id VARCHAR(36) NOT NULL "
+        "COMMENT 'User created by the original request' AFTER `key`"
+    )
+
+    op.execute("ALTER TABLE users ADD COLUMN id_str VARCHAR(36) NULL")
+    op.execute("UPDATE users SET id_str = BIN_TO_UUID(id)")
+    op.execute(
+        "ALTER TABLE users DROP PRIMARY KEY, DROP COLUMN id, "
+        "CHANGE id_str id VARCHAR(36) NOT NULL FIRST, ADD PRIMARY KEY (id)"
+    )
@@ -0,0 +1,67 @@
+"""Add users_archive table
+
+Revision ID: d41e8c2a9f57
+Revises: b7a93e05d1c2
+Create Date: 2026-10-18 16:05:27.530912
+
+Holds soft-deleted users moved out of users by the retention job
+(python -m app.jobs.archive). Same columns as users, without the unique
+indexes. idx_deleted_at lets the job find expired rows without a scan.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e8c2a9f57'
+down_revision: Union[str, None] = 'b7a93e05d1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users_archive',
+        sa.Column('id', sa.BINARY(length=16), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('email_domain', sa.String(length=255), nullable=True),
+        sa.Column('primary_mobile', sa.String(length=15), nullable=False),
+        sa.Column('secondary_mobile', sa.String(length=15), nullable=True),
+        sa.Column('aadhaar', sa.String(length=12), nullable=False),
+        sa.Column('pan', sa.String(length=10), nullable=False),
+        sa.Column('date_of_birth', sa.Date(), nullable=False),
+        sa.Column('place_of_birth', sa.String(length=255), nullable=False),
+        sa.Column('current_address', sa.Text(), nullable=False),
+        sa.Column('permanent_address', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_by', sa.String(length=36), nullable=True),
+        sa.Column('updated_by', sa.String(length=36), nullable=True),
+        sa.Column('is_deleted', sa.Boolean(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_by', sa.String(length=36), nullable=True),
+        sa.Column('version', sa.String(length=36), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('email_verified', sa.Boolean(), nullable=False),
+        sa.Column('mobile_verified', sa.Boolean(), nullable=False),
+        sa.Column('last_login_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('profile_picture', sa.String(length=500), nullable=True),
+        sa.Column('bio', sa.Text(), nullable=True),
+        sa.Column('preferred_language', sa.String(length=10), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_archive_email', 'users_archive', ['email'], unique=False)
+    op.create_index('ix_users_archive_archived_at', 'users_archive', ['archived_at'], unique=False)
+    op.create_index('idx_deleted_at', 'users', ['is_deleted', 'deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_deleted_at', table_name='users')
+    op.drop_index('ix_users_archive_archived_at', table_name='users_archive')
+    op.drop_index('ix_users_archive_email', table_name='users_archive')
+    op.drop_table('users_archive')
@@ -1,15 +1,65 @@
-from fastapi import APIRouter, Depends, Query, status, Request
+from fastapi import APIRouter, Depends, Header, Query, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.user import UserCreate, UserUpdate, UserResponse, PaginatedUserResponse
-from app.services.user_service import UserService
-from app.config import get_settings
+from typing import Optional
+from datetime import datetime
+from app.database import get_db, get_session
+from app.schemas.user import (
+    UserCreate, UserUpdate, UserResponse, PaginatedUserResponse, BulkUserResponse,
+    UserLookupRequest, UserLookupResponse, UserAutocompleteResponse, UserChangesResponse,
+    projected_user_response, projected_paginated_response
+)
+from app.services.user_service import UserService, USER_FIELDS
+from app.services.async_user_service import AsyncUserService, DBSession
+from app.config import Settings
+from app.utils.ingest import iter_request_body, iter_lines, parse_csv, parse_ndjson
+from app.utils.etag import ETag
+from app.utils.fastjson import RawJSONResponse, dumps
+from app.routing import read_only
 
 router = APIRouter(prefix="/users", tags=["users"])
-settings = get_settings()
+
+FIELDS_DESCRIPTION = f"Comma-separated fields to return (default: all of {', '.join(USER_FIELDS)})"
+
+def app_settings(request: Request) -> Settings:
+    """Settings of the application serving the request, as passed to create_app."""
+    return request.app.state.settings
+
+def _at_most(name: str, value: int, maximum: int) -> int:
+    """Check a query parameter against a per-application limit, failing like Query(le=...) would."""
+    if value > maximum:
+        raise RequestValidationError([{
+            "type": "less_than_equal",
+            "loc": ("query", name),
+            "msg": f"Input should be less than or equal to {maximum}",
+            "input": value,
+            "ctx": {"le": maximum},
+        }])
+    return value
+
+def _page_size(page_size: Optional[int], settings: Settings) -> int:
+    return _at_most("page_size", page_size or settings.DEFAULT_PAGE_SIZE, settings.MAX_PAGE_SIZE)
+
+PAGE_SIZE_DESCRIPTION = "Items per page (default DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE)"
+
+def _projected(model, content, headers: Optional[dict] = None) -> Response:
+    """Serialize a fields= projection, which the route's full response_model cannot describe."""
+    return Response(model.model_validate(content).model_dump_json(), media_type="application/json", headers=headers)
+
+def _encoded_page(result: dict, fields: list) -> Response:
+    """
+    Encode a page of Row tuples straight to JSON bytes.
+
+    Skips per-object response_model validation; the routes keep their
+    response_model, so the OpenAPI schema is unchanged.
+    """
+    result["data"] = [{name: getattr(row, name) for name in fields} for row in result["data"]]
+    return RawJSONResponse(dumps(result))
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(request: Request, user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(request: Request, response: Response, user: UserCreate, db: DBSession = Depends(get_session)):
     """
     Create a new user with all validations.
     
@@ -18,64 +68,258 @@ def create_user(request: Request, user: UserCreate, db: Session = Depends(get_db
     - Prevents duplicate registrations
     - Rate limited: 100 requests per minute per IP (global default)
     - Supports idempotency_key to prevent duplicate submissions
+    - Returns an ETag derived from the row version
+    """
+    db_user = await AsyncUserService.create_user(db, user)
+    response.headers["ETag"] = ETag.from_version(db_user.version)
+    return db_user
+
+# Bulk ingest and export stream on a sync session in both database modes:
+# each occupies one worker thread for its whole duration either way.
+@router.post("/bulk", response_model=BulkUserResponse)
+async def bulk_create_users(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="Body format; defaults from Content-Type"),
+    db: Session = Depends(get_db),
+    settings: Settings = Depends(app_settings)
+):
+    """
+    Create users in bulk from a streamed NDJSON or CSV body.
+    
+    - One user per NDJSON line, or a CSV with a header row of UserCreate fields
+    - Rows are validated like POST /users/ and inserted in multi-row chunks
+    - Returns a per-row report; invalid or duplicate rows do not fail the upload
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    parse = parse_csv if format == "csv" else parse_ndjson
+    
+    def ingest():
+        rows = parse(iter_lines(iter_request_body(request)))
+        return UserService.bulk_create_users(db, rows, settings.BULK_CHUNK_SIZE)
+    
+    return await run_in_threadpool(ingest)
+
+@router.post("/lookup", response_model=UserLookupResponse)
+@read_only
+async def lookup_users(lookup: UserLookupRequest, db: DBSession = Depends(get_session),
+                       settings: Settings = Depends(app_settings)):
+    """
+    Resolve many users in one request.
+    
+    - Accepts ids and exact email, primary_mobile, aadhaar and pan values, in any combination
+    - One IN (...) query per key on its unique index; ids are served from the entity cache when possible
+    - Each result list follows the order of the request's list; misses (unknown or deleted) have found=false
+    - At most LOOKUP_MAX_VALUES values per request
+    - A read: served by replicas like GET requests
     """
-    return UserService.create_user(db, user)
+    result = await AsyncUserService.lookup_users(db, lookup.model_dump(), settings.LOOKUP_MAX_VALUES)
+    if settings.FAST_JSON_RESPONSES:
+        return RawJSONResponse(dumps(result))
+    return result
+
+@router.get("/autocomplete", response_model=UserAutocompleteResponse)
+async def autocomplete_users(
+    prefix: str = Query(..., min_length=1, max_length=255, description="Start of the name, as typed"),
+    limit: int = Query(10, ge=1, description="Maximum suggestions, at most MAX_PAGE_SIZE"),
+    db: DBSession = Depends(get_session),
+    settings: Settings = Depends(app_settings)
+):
+    """
+    Suggest users whose name starts with prefix, for type-ahead.
+    
+    - Case- and accent-insensitive; repeated spaces are ignored
+    - With AUTOCOMPLETE_ENABLED, served from an in-process sorted index of names without a database query
+    - Otherwise, and until the index is built after startup, a range scan on the name index
+    """
+    limit = _at_most("limit", limit, settings.MAX_PAGE_SIZE)
+    matches = await AsyncUserService.autocomplete_users(db, prefix, limit)
+    result = {"prefix": prefix, "data": matches}
+    if settings.FAST_JSON_RESPONSES:
+        return RawJSONResponse(dumps(result))
+    return result
+
+@router.get("/changes", response_model=UserChangesResponse)
+async def get_changes(
+    since: Optional[str] = Query(None, description="next_cursor of the previous batch; omit to start from the beginning"),
+    limit: int = Query(100, ge=1, description="Changes per batch, at most CHANGES_MAX_BATCH_SIZE"),
+    db: DBSession = Depends(get_session),
+    settings: Settings = Depends(app_settings)
+):
+    """
+    Users created, updated or soft-deleted since a cursor, for incremental sync.
+    
+    - Oldest change first, in (updated_at, id) order on idx_updated_at_id
+    - Each user appears in its latest state; deleted users are tombstones with user=null
+    - Changes younger than CHANGES_SAFETY_LAG_SECONDS are held back so none is skipped
+    - Resume with since=next_cursor; an empty batch returns the same cursor to poll again
+    - Always read from the primary
+    """
+    limit = _at_most("limit", limit, settings.CHANGES_MAX_BATCH_SIZE)
+    result = await AsyncUserService.get_changes(db, since, limit, settings.CHANGES_SAFETY_LAG_SECONDS)
+    if settings.FAST_JSON_RESPONSES:
+        return RawJSONResponse(dumps(result))
+    return result
+
+@router.get("/export")
+def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Output format"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    created_from: Optional[datetime] = Query(None, description="Only users created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only users created before this time"),
+    updated_from: Optional[datetime] = Query(None, description="Only users updated at or after this time"),
+    updated_to: Optional[datetime] = Query(None, description="Only users updated before this time"),
+    db: Session = Depends(get_db),
+    settings: Settings = Depends(app_settings)
+):
+    """
+    Stream all non-deleted users as NDJSON or CSV.
+    
+    - Streams from a server-side cursor with constant memory
+    - Supports column selection and created_at/updated_at ranges
+    - Rows are not ordered
+    """
+    selected = UserService._select_fields(fields, USER_FIELDS)
+    body = UserService.export_users(db, selected, format, created_from, created_to, updated_from, updated_to,
+                                    settings.EXPORT_BATCH_SIZE)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: str, db: Session = Depends(get_db)):
-    """Get a user by ID"""
-    return UserService.get_user_by_id(db, user_id)
+async def get_user(
+    user_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: DBSession = Depends(get_session),
+    settings: Settings = Depends(app_settings)
+):
+    """
+    Get a user by ID.
+    
+    - Served from the entity cache when possible
+    - Returns an ETag derived from the row version
+    - Send If-None-Match with that ETag to get 304 Not Modified
+    - fields=id,name,email returns only those fields
+    """
+    selected = UserService._select_fields(fields, USER_FIELDS) if fields else None
+    user = await AsyncUserService.get_user_cached(db, user_id)
+    etag = ETag.from_version(user["version"])
+    if ETag.matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if settings.FAST_JSON_RESPONSES:
+        return RawJSONResponse(dumps({name: user[name] for name in selected or USER_FIELDS}), headers={"ETag": etag})
+    if selected:
+        return _projected(projected_user_response(tuple(selected)), user, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(
+    user_id: str,
+    user: UserUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag from a previous read; the update fails with 412 if the user has changed"),
+    db: DBSession = Depends(get_session)
+):
     """
     Update user information.
     
     - Only provided fields are updated
     - Validates uniqueness constraints
-    - Uses optimistic locking with version field
+    - Uses optimistic locking: send If-Match (or version in the body) to get 412 on a concurrent change
+    - Returns the new ETag
     """
-    return UserService.update_user(db, user_id, user)
+    db_user = await AsyncUserService.update_user(db, user_id, user, ETag.versions(if_match))
+    response.headers["ETag"] = ETag.from_version(db_user.version)
+    return db_user
 
 @router.get("/", response_model=PaginatedUserResponse)
-def get_all_users(
+async def get_all_users(
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE, description="Items per page"),
-    db: Session = Depends(get_db)
+    page_size: Optional[int] = Query(None, ge=1, description=PAGE_SIZE_DESCRIPTION),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor; takes precedence over page"),
+    count: str = Query("exact", pattern="^(exact|estimated|none)$", description="exact: COUNT(*); estimated: cached count refreshed in the background; none: skip the count and rely on has_more"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: DBSession = Depends(get_session),
+    settings: Settings = Depends(app_settings)
 ):
     """
     Get all users with pagination.
     
-    - Default page size: 10
-    - Maximum page size: 100
+    - Default page size: DEFAULT_PAGE_SIZE (10)
+    - Maximum page size: MAX_PAGE_SIZE (100)
     - Returns total count and page info
+    - Pass next_cursor back as cursor for stable, constant-time deep paging
+    - count=estimated or count=none avoids a full COUNT(*) per page
+    - fields=id,name,email loads and returns only those columns
     """
-    return UserService.get_all_users(db, page, page_size)
+    page_size = _page_size(page_size, settings)
+    selected = UserService._select_fields(fields, USER_FIELDS) if fields else None
+    if settings.FAST_JSON_RESPONSES:
+        result = await AsyncUserService.get_all_users(db, page, page_size, cursor, count, selected, as_rows=True)
+        return _encoded_page(result, selected or USER_FIELDS)
+    result = await AsyncUserService.get_all_users(db, page, page_size, cursor, count, selected)
+    if selected:
+        return _projected(projected_paginated_response(tuple(selected)), result)
+    return result
 
 @router.delete("/{user_id}", response_model=UserResponse)
-def delete_user(user_id: str, db: Session = Depends(get_db)):
+async def delete_user(
+    user_id: str,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag from a previous read; the delete fails with 412 if the user has changed"),
+    db: DBSession = Depends(get_session)
+):
     """
     Soft delete a user.
     
     - User is marked as deleted but not removed from database
     - Allows data recovery and audit trail
+    - Honours If-Match like PUT
+    - Returns the ETag of the deleted version
     """
-    return UserService.soft_delete_user(db, user_id)
+    db_user = await AsyncUserService.soft_delete_user(db, user_id, ETag.versions(if_match))
+    response.headers["ETag"] = ETag.from_version(db_user.version)
+    return db_user
 
 @router.get("/search/", response_model=PaginatedUserResponse)
-def search_users(
+async def search_users(
     request: Request,
     q: str = Query(..., min_length=2, description="Search query for name or email"),
+    mode: str = Query("fulltext", pattern="^(fulltext|prefix|domain)$", description="fulltext: substring match on name or email; prefix: name or email starts with q; domain: email domain starts with q"),
+    sort: str = Query("relevance", pattern="^(relevance|recent)$", description="relevance (fulltext only) or recent; cursor paging requires recent"),
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE, description="Items per page"),
-    db: Session = Depends(get_db)
+    page_size: Optional[int] = Query(None, ge=1, description=PAGE_SIZE_DESCRIPTION),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor; takes precedence over page"),
+    count: str = Query("exact", pattern="^(exact|estimated|none)$", description="exact: COUNT(*); estimated: cached count refreshed in the background; none: skip the count and rely on has_more"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: DBSession = Depends(get_session),
+    settings: Settings = Depends(app_settings)
 ):
     """
     Search users by name or email.
     
     - Minimum 2 characters required
-    - Searches in name and email fields
-    - Returns paginated results
+    - Searches in name and email fields using the full-text index
+    - prefix and domain modes use plain B-tree range scans
+    - Returns paginated results; sort=recent adds next_cursor for keyset paging
+    - count=estimated or count=none avoids a full COUNT(*) per page
+    - fields=id,name,email loads and returns only those columns
     - Rate limited: 100 requests per minute per IP (global default)
     """
-    return UserService.search_users(db, q, page, page_size)
\ No newline at end of file
+    page_size = _page_size(page_size, settings)
+    selected = UserService._select_fields(fields, USER_FIELDS) if fields else None
+    if settings.FAST_JSON_RESPONSES:
+        result = await AsyncUserService.search_users(db, q, page, page_size, cursor, mode, sort, count, selected,
+                                                     as_rows=True, backend_name=settings.SEARCH_BACKEND)
+        return _encoded_page(result, selected or USER_FIELDS)
+    result = await AsyncUserService.search_users(db, q, page, page_size, cursor, mode, sort, count, selected,
+                                                 backend_name=settings.SEARCH_BACKEND)
+    if selected:
+        return _projected(projected_paginated_response(tuple(selected)), result)
+    return result
\ No newline at end of file
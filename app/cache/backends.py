@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+import threading
+import time
+from app.config import get_settings
+
+class CacheBackend:
+    """Minimal key/value interface every cache backend implements."""
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value); a hit may carry a stored None."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+class NullCache(CacheBackend):
+    """Backend that never stores anything, for disabling the cache."""
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        return False, None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU cache with per-entry TTL.
+
+    Entries are private to the worker process, so writes handled by another
+    worker are only seen here once the entry expires.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+@lru_cache()
+def get_cache_backend(name: Optional[str] = None) -> CacheBackend:
+    settings = get_settings()
+    name = name or settings.CACHE_BACKEND
+    if name == "memory":
+        return MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES)
+    if name == "none":
+        return NullCache()
+    raise ValueError(f"Unknown cache backend: {name}")
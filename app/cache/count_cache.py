@@ -0,0 +1,67 @@
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+import logging
+import threading
+import time
+from app.cache.backends import MemoryCache
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class CountCache:
+    """
+    Stale-while-revalidate cache of row counts for estimated totals.
+
+    A cold key is counted inline once. After COUNT_CACHE_TTL_SECONDS the
+    cached value keeps being served while a background thread recounts on
+    its own session, so no request waits on a full COUNT(*) again.
+    """
+
+    def __init__(self, max_entries: int):
+        self.backend = MemoryCache(max_entries=max_entries)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, query: Query) -> int:
+        ttl = get_settings().COUNT_CACHE_TTL_SECONDS
+        hit, entry = self.backend.get(key)
+        if hit:
+            total, counted_at = entry
+            if time.monotonic() - counted_at <= ttl:
+                return total
+
+        bind = query.session.get_bind()
+        if not hit or not isinstance(bind, Engine) or bind.dialect.is_async:
+            # Cold key, a connection-bound session that cannot be handed to
+            # another thread, or an async engine that only runs on the event
+            # loop: count inline.
+            total = query.count()
+            self.backend.set(key, (total, time.monotonic()), ttl * 10)
+            return total
+
+        self._refresh_in_background(key, query, bind, ttl)
+        return total
+
+    def _refresh_in_background(self, key: str, query: Query, bind: Engine, ttl: int) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with Session(bind=bind) as session:
+                    total = query.with_session(session).count()
+                self.backend.set(key, (total, time.monotonic()), ttl * 10)
+            except Exception:
+                logger.exception("Failed to refresh count for %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="count-refresh", daemon=True).start()
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+count_cache = CountCache(max_entries=get_settings().COUNT_CACHE_MAX_ENTRIES)
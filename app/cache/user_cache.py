@@ -0,0 +1,49 @@
+from typing import Optional, Tuple
+from app.cache.backends import CacheBackend, get_cache_backend
+from app.config import get_settings
+
+class UserCache:
+    """
+    Read-through cache of serialized users.
+
+    Each user has a pointer entry holding its current version and a data
+    entry keyed by (id, version). Invalidation only drops the pointer, so a
+    concurrent reader can never pair a new version with an old body. A
+    pointer holding None records a recent miss for an unknown id.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def _pointer_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _entry_key(user_id: str, version: str) -> str:
+        return f"user:{user_id}:{version}"
+
+    def get(self, user_id: str) -> Tuple[bool, Optional[dict]]:
+        """Return (hit, data); a hit with None data is a cached miss."""
+        hit, version = self.backend.get(self._pointer_key(user_id))
+        if not hit:
+            return False, None
+        if version is None:
+            return True, None
+        return self.backend.get(self._entry_key(user_id, version))
+
+    def put(self, user_id: str, data: dict) -> None:
+        ttl = get_settings().CACHE_TTL_SECONDS
+        self.backend.set(self._entry_key(user_id, data["version"]), data, ttl)
+        self.backend.set(self._pointer_key(user_id), data["version"], ttl)
+
+    def put_missing(self, user_id: str) -> None:
+        self.backend.set(self._pointer_key(user_id), None, get_settings().CACHE_NEGATIVE_TTL_SECONDS)
+
+    def invalidate(self, user_id: str) -> None:
+        self.backend.delete(self._pointer_key(user_id))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+user_cache = UserCache(get_cache_backend())
@@ -1,8 +1,34 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DATABASE_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    DATABASE_REPLICA_URLS: list = []
+    REPLICA_ROUTING: str = "round_robin"
+    READ_YOUR_WRITES_SECONDS: int = 5
+    
+    # Connections allowed per database server, shared by all worker processes
+    DB_CONNECTION_BUDGET: int = 150
+    WEB_CONCURRENCY: int = 1
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+    DB_LEAK_THRESHOLD_SECONDS: float = 30
+    DB_TRACK_CHECKOUT_STACKS: bool = True
+    
+    # python -m app.serve; runs WEB_CONCURRENCY worker processes
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_LOOP: str = "auto"
+    SERVER_HTTP: str = "auto"
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    SERVER_WARMUP: bool = True
     
     APP_NAME: str = "User Management System"
     APP_VERSION: str = "1.0.0"
@@ -12,6 +38,51 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 10
     MAX_PAGE_SIZE: int = 100
     
+    BULK_CHUNK_SIZE: int = 500
+    LOOKUP_MAX_VALUES: int = 100
+    
+    CHANGES_MAX_BATCH_SIZE: int = 1000
+    CHANGES_SAFETY_LAG_SECONDS: int = 5
+    
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+    
+    RETENTION_DAYS: int = 90
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.1
+    RETENTION_INTERVAL_SECONDS: int = 86400
+    
+    CACHE_BACKEND: str = "memory"
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_NEGATIVE_TTL_SECONDS: int = 5
+    
+    SEARCH_BACKEND: str = "auto"
+    
+    COUNT_CACHE_TTL_SECONDS: int = 60
+    COUNT_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Opt-in: the name index costs about 236 bytes per user in every worker
+    # (500000 users: ~115 MB per worker, times WEB_CONCURRENCY)
+    AUTOCOMPLETE_ENABLED: bool = False
+    AUTOCOMPLETE_MAX_ENTRIES: int = 500000
+    AUTOCOMPLETE_REFRESH_SECONDS: int = 30
+    
+    EXPORT_BATCH_SIZE: int = 2000
+    
+    FAST_JSON_RESPONSES: bool = True
+    
+    USER_ID_SCHEME: str = "uuid7"
+    
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_THRESHOLD_MS: Optional[float] = None
+    
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_FILE: str = "app.log"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: dict = {}
+    
     LOG_HASH_SECRET: str = "change-this-in-production-to-a-secure-random-value"
     ALLOWED_ORIGINS: list = ["http://localhost:3000", "http://localhost:8080"]
     
@@ -1,26 +1,204 @@
-from sqlalchemy import create_engine
+"""
+Engines and session factories.
+
+Nothing is created at import time, so importing the models (Alembic, jobs,
+tests) does not build pools or import a database driver. A Database is
+built from Settings by init_database(), which the application lifespan
+calls, or on first use. The module-level engine, SessionLocal and related
+names are kept for existing imports and resolve to the current Database.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from fastapi.concurrency import contextmanager_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from typing import Optional
+import threading
 from app.config import get_settings
+from app.pool import PoolMonitor, TimedAsyncQueuePool, TimedQueuePool, pool_options
+from app.routing import PRIMARY_COOKIE, ReplicaSet, is_write, routing_session_class
+from app import metrics
 
-settings = get_settings()
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=50,
-    max_overflow=100,
-    pool_recycle=3600,
-    pool_timeout=30,
-    echo=settings.DEBUG
-)
+# Registered on the Engine class so every engine, including test engines,
+# reports statement counts and DB time.
+event.listen(Engine, "before_cursor_execute", metrics.before_cursor_execute)
+event.listen(Engine, "after_cursor_execute", metrics.after_cursor_execute)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def async_database_url(url: Optional[str] = None, settings=None) -> str:
+    """ASYNC_DATABASE_URL, or a URL (default DATABASE_URL) with its driver swapped for the async one."""
+    settings = settings or get_settings()
+    if url is None and settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(url or settings.DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+class Database:
+    """The engines and session factories for one Settings."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.monitors = []
+        # In async mode each worker also keeps the sync engine for bulk ingest,
+        # export and background jobs, so both draw on the same budget.
+        self.engine_options = dict(
+            **pool_options(settings, engines_per_server=2 if settings.DATABASE_ASYNC else 1),
+            echo=settings.DEBUG
+        )
+
+        self.engine = self._monitored_engine(settings.DATABASE_URL, "primary")
+        self.replica_engines = [
+            self._monitored_engine(url, f"replica{index}") for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+        ]
+        self.replicas = ReplicaSet(self.replica_engines, settings.REPLICA_ROUTING) if self.replica_engines else None
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, class_=routing_session_class(self.engine, self.replicas)
+        )
+
+        self.async_engine = None
+        self.async_replica_engines = []
+        self.AsyncSessionLocal = None
+        if settings.DATABASE_ASYNC:
+            self._create_async()
+
+    def _monitored_engine(self, url: str, name: str, create=create_engine, poolclass=TimedQueuePool):
+        """Engine with engine_options whose pool is labelled name in metrics and leak reports."""
+        engine = create(url, poolclass=poolclass, pool_logging_name=name, **self.engine_options)
+        self.monitors.append(PoolMonitor(
+            getattr(engine, "sync_engine", engine), name,
+            self.settings.DB_LEAK_THRESHOLD_SECONDS, self.settings.DB_TRACK_CHECKOUT_STACKS
+        ))
+        return engine
+
+    def _create_async(self):
+        # Imported here so the async extension and its driver stay optional
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        settings = self.settings
+        self.async_engine = self._monitored_engine(
+            async_database_url(settings=settings), "primary_async", create_async_engine, TimedAsyncQueuePool
+        )
+        self.async_replica_engines = [
+            self._monitored_engine(
+                async_database_url(url, settings), f"replica{index}_async", create_async_engine, TimedAsyncQueuePool
+            )
+            for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+        ]
+        self.AsyncSessionLocal = async_sessionmaker(
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=routing_session_class(
+                self.async_engine.sync_engine,
+                ReplicaSet([replica.sync_engine for replica in self.async_replica_engines], settings.REPLICA_ROUTING)
+                if self.async_replica_engines else None
+            )
+        )
+
+    async def dispose(self) -> None:
+        for monitor in self.monitors:
+            monitor.close()
+        for engine in [self.engine, *self.replica_engines]:
+            engine.dispose()
+        for engine in filter(None, [self.async_engine, *self.async_replica_engines]):
+            await engine.dispose()
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+def init_database(settings=None) -> Database:
+    """
+    Make a Database for settings (default get_settings()) the current one.
+
+    Returns the current Database if it was already built from the same
+    settings; otherwise the previous one is replaced, not disposed.
+    """
+    global _database
+    settings = settings or get_settings()
+    with _database_lock:
+        if _database is None or _database.settings is not settings:
+            _database = Database(settings)
+        return _database
+
+def get_database() -> Database:
+    """The current Database, built from get_settings() on first use."""
+    return _database or init_database()
+
+async def close_database(database: Optional[Database] = None) -> None:
+    """
+    Dispose database (default the current one); the next use builds a new one.
+
+    The current Database is only reset if it is the one being disposed.
+    """
+    global _database
+    with _database_lock:
+        database = database or _database
+        if _database is database:
+            _database = None
+    if database is not None:
+        await database.dispose()
+
+# Module attributes from before the engines were built lazily
+_DATABASE_ATTRIBUTES = {
+    "ENGINE_OPTIONS": "engine_options",
+    "engine": "engine",
+    "replica_engines": "replica_engines",
+    "replicas": "replicas",
+    "SessionLocal": "SessionLocal",
+    "async_engine": "async_engine",
+    "async_replica_engines": "async_replica_engines",
+    "AsyncSessionLocal": "AsyncSessionLocal",
+}
+
+def __getattr__(name: str):
+    if name in _DATABASE_ATTRIBUTES:
+        return getattr(get_database(), _DATABASE_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def request_database(request: Request) -> Database:
+    """The Database built by the lifespan of the application serving request, else the current one."""
+    return getattr(request.app.state, "database", None) or get_database()
+
+def _uses_primary(request: Request) -> bool:
+    """Writes, and reads from clients that wrote recently, go to the primary."""
+    return is_write(request.scope) or PRIMARY_COOKIE in request.cookies
+
+def get_db(request: Request):
+    db = request_database(request).SessionLocal()
+    if _uses_primary(request):
+        db.info['use_primary'] = True
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db(request: Request):
+    async with request_database(request).AsyncSessionLocal() as db:
+        if _uses_primary(request):
+            db.sync_session.info['use_primary'] = True
+        yield db
+
+async def get_session(request: Request):
+    """
+    Session dependency for the request handlers.
+
+    An AsyncSession when the serving application's settings have
+    DATABASE_ASYNC, otherwise get_db's sync Session, opened and closed on
+    the threadpool as FastAPI does for sync dependencies.
+    """
+    if request_database(request).settings.DATABASE_ASYNC:
+        async with asynccontextmanager(get_async_db)(request) as db:
+            yield db
+    else:
+        async with contextmanager_in_threadpool(contextmanager(get_db)(request)) as db:
+            yield db
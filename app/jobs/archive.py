@@ -0,0 +1,63 @@
+"""
+Move users soft-deleted more than --days ago into users_archive.
+
+    python -m app.jobs.archive --days 90 --batch-size 500 --pause 0.1
+    python -m app.jobs.archive --dry-run
+
+The API runs the same job every RETENTION_INTERVAL_SECONDS. After the first
+large run on MySQL, pass --optimize to rebuild users so the table and its
+indexes actually shrink on disk.
+"""
+import argparse
+from typing import Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app.config import get_settings
+from app.database import get_database
+from app.services.retention_service import RetentionService
+
+def optimize_users_table(engine: Optional[Engine] = None) -> None:
+    """
+    Rebuild users to release the space of archived rows.
+
+    VACUUM may renumber the implicit rowids of users (its primary key is
+    not an INTEGER), which the external-content users_fts table points at,
+    so on SQLite the full-text index is rebuilt afterwards.
+    """
+    engine = engine or get_database().engine
+    statement = {"mysql": "OPTIMIZE TABLE users", "sqlite": "VACUUM"}.get(engine.dialect.name)
+    if statement is None:
+        print(f"No optimize statement for {engine.dialect.name}; skipped")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(statement))
+        if engine.dialect.name == "sqlite" and inspect(conn).has_table("users_fts"):
+            conn.execute(text("INSERT INTO users_fts(users_fts) VALUES('rebuild')"))
+    print(f"Ran {statement}")
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Archive soft-deleted users past the retention period")
+    parser.add_argument("--days", type=int, default=settings.RETENTION_DAYS, help="Archive users deleted more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=settings.RETENTION_BATCH_SIZE, help="Rows moved per transaction")
+    parser.add_argument("--pause", type=float, default=settings.RETENTION_BATCH_PAUSE_SECONDS, help="Seconds to sleep between batches")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the users that would be archived")
+    parser.add_argument("--optimize", action="store_true", help="Rebuild the users table afterwards")
+    args = parser.parse_args()
+
+    db = get_database().SessionLocal()
+    try:
+        if args.dry_run:
+            print(f"{RetentionService.count_archivable(db, args.days)} users would be archived")
+            return
+        archived = RetentionService.archive_deleted_users(db, args.days, args.batch_size, args.pause, args.max_batches)
+        print(f"Archived {archived} users")
+    finally:
+        db.close()
+
+    if args.optimize:
+        optimize_users_table()
+
+if __name__ == "__main__":
+    main()
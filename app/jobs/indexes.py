@@ -0,0 +1,386 @@
+"""
+Index advisor for the users table.
+
+    python -m app.jobs.indexes
+    python -m app.jobs.indexes --write-migration -m "consolidate user indexes" --drop idx_created_at
+
+Compares the indexes declared on the model with the live schema, then runs
+the statements UserService issues for each API operation inside a
+transaction that is rolled back, EXPLAINs every one of them and reports:
+
+- redundant indexes: duplicates, left prefixes of another index, and
+  non-unique indexes that only extend a unique key
+- unused indexes: live indexes that no explained statement used
+- missing indexes: statements that scan users or sort in a temporary
+  structure, with the index that would serve them
+
+--write-migration turns the redundant and missing indexes (plus any
+--drop names) into an Alembic revision. Unused indexes are only dropped
+when named with --drop: plans from a small or SQLite database can miss
+indexes MySQL would use.
+"""
+import argparse
+import random
+import re
+import string
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, False_, True_, UnaryExpression
+from app.cache.user_cache import user_cache
+from app.config import get_settings
+from app.database import get_database
+from app.models.user import User
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.retention_service import RetentionService
+from app.services.user_service import UserService
+from app.utils.pagination import Cursor
+
+PRIMARY = "PRIMARY"
+
+def declared_indexes(table) -> List[dict]:
+    """Indexes on the model, in the shape Inspector.get_indexes() returns."""
+    indexes = [{
+        "name": index.name,
+        "column_names": [column.name for column in index.columns],
+        "unique": bool(index.unique),
+        "fulltext": index.dialect_kwargs.get("mysql_prefix") == "FULLTEXT",
+    } for index in table.indexes]
+    return sorted(indexes, key=lambda index: index["name"])
+
+def live_indexes(bind, table_name: str) -> List[dict]:
+    """Indexes in the database, with the primary key listed as PRIMARY."""
+    inspector = inspect(bind)
+    indexes = [{
+        "name": PRIMARY,
+        "column_names": inspector.get_pk_constraint(table_name)["constrained_columns"],
+        "unique": True,
+        "fulltext": False,
+    }]
+    for index in inspector.get_indexes(table_name):
+        indexes.append({
+            "name": index["name"],
+            "column_names": index["column_names"],
+            "unique": bool(index["unique"]),
+            "fulltext": index.get("dialect_options", {}).get("mysql_prefix") == "FULLTEXT",
+        })
+    return indexes
+
+def _is_column_level(index: dict, table_name: str) -> bool:
+    """Whether the index is the one Column(index=True) creates."""
+    return index["name"] == f"ix_{table_name}_{'_'.join(index['column_names'])}"
+
+def redundant_indexes(indexes: List[dict], table_name: str) -> List[Tuple[dict, str]]:
+    """
+    Non-unique B-tree indexes that other indexes already serve, with the reason.
+
+    Checked one at a time against the indexes not yet found redundant, so
+    two indexes never justify dropping each other.
+    """
+    btree = [index for index in indexes if not index["fulltext"]]
+    # Consider the least useful first: non-unique, declared in __table_args__
+    # rather than by index=True, longest last
+    candidates = sorted(
+        (index for index in btree if not index["unique"]),
+        key=lambda index: (_is_column_level(index, table_name), -len(index["column_names"]), index["name"]),
+    )
+    dropped = set()
+    found = []
+    for index in candidates:
+        columns = tuple(index["column_names"])
+        others = [other for other in btree if other["name"] != index["name"] and other["name"] not in dropped]
+        reason = None
+        for other in others:
+            other_columns = tuple(other["column_names"])
+            if other_columns == columns:
+                reason = f"duplicate of {other['name']}"
+            elif other_columns[:len(columns)] == columns:
+                reason = f"left prefix of {other['name']}"
+            if reason:
+                break
+        if reason is None:
+            reason = _extends_unique(index, others)
+        if reason:
+            dropped.add(index["name"])
+            found.append((index, reason))
+    return found
+
+def _extends_unique(index: dict, others: List[dict]) -> Optional[str]:
+    """
+    A non-unique index holding all columns of a unique key adds nothing when
+    each of its prefixes without the full key is served by another index.
+    """
+    columns = tuple(index["column_names"])
+    for unique in (other for other in others if other["unique"]):
+        key = set(unique["column_names"])
+        if not key <= set(columns):
+            continue
+        prefixes = [columns[:length] for length in range(1, len(columns)) if not key <= set(columns[:length])]
+        if all(any(tuple(other["column_names"])[:len(prefix)] == prefix for other in others) for prefix in prefixes):
+            return f"lookups are answered by unique {unique['name']}"
+    return None
+
+def sample_user() -> UserCreate:
+    """A valid user unlikely to collide with real rows; it never outlives the rolled-back transaction."""
+    digits = lambda count: "".join(random.choices(string.digits, k=count))
+    return UserCreate(
+        name="Index Advisor",
+        email=f"index-advisor-{uuid.uuid4().hex[:12]}@example.com",
+        primary_mobile="9" + digits(9),
+        aadhaar=digits(12),
+        pan="".join(random.choices(string.ascii_uppercase, k=5)) + digits(4) + "Z",
+        date_of_birth="1990-01-01",
+        place_of_birth="Mumbai",
+        current_address="1 Advisor Road, Mumbai",
+        permanent_address="1 Advisor Road, Mumbai",
+    )
+
+def workload(db: Session, operation: Callable[[str], None]) -> None:
+    """Call the UserService paths behind every API operation, naming each with operation()."""
+    operation("create")
+    user = UserService.create_user(db, sample_user())
+    user_id = str(user.id)
+
+    operation("get")
+    user_cache.invalidate(user_id)
+    UserService.get_user_cached(db, user_id)
+
+    operation("update")
+    user = UserService.update_user(db, user_id, UserUpdate(name="Index Advisor Updated"), [user.version])
+
+    operation("list")
+    UserService.get_all_users(db, count="exact")
+    operation("list_cursor")
+    UserService.get_all_users(db, cursor=Cursor.encode(user.created_at, user_id), count="none")
+
+    for mode in ("fulltext", "prefix", "domain"):
+        operation(f"search_{mode}")
+        UserService.search_users(db, "inde", mode=mode, count="exact")
+    operation("search_recent")
+    UserService.search_users(db, "inde", mode="prefix", sort="recent", count="none")
+
+    operation("changes")
+    UserService.get_changes(db, Cursor.encode(user.updated_at or user.created_at, user_id))
+
+    operation("delete")
+    UserService.soft_delete_user(db, user_id)
+
+    operation("archive")
+    cutoff = datetime.utcnow() - timedelta(days=get_settings().RETENTION_DAYS)
+    RetentionService.archive_batch(db, cutoff, 1)
+
+def capture_statements(connection, table_name: str) -> List[dict]:
+    """Run workload() on connection and return the statements it sent that read or change table_name."""
+    captured = []
+    current = ["setup"]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", statement, re.I):
+            return
+        if not re.search(rf"\b{table_name}\b", statement):
+            return
+        compiled = context.compiled.statement if context is not None and context.compiled is not None else None
+        captured.append({"operation": current[0], "statement": statement, "parameters": parameters, "clause": compiled})
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        # Service commits only release a SAVEPOINT; the caller rolls back
+        db = Session(bind=connection, join_transaction_mode="create_savepoint", autoflush=False)
+        workload(db, lambda name: current.__setitem__(0, name))
+        db.close()
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+    return captured
+
+def explain(connection, statement: str, parameters, table_name: str) -> dict:
+    """Indexes used, full scans and temporary sorts in the plan of one statement."""
+    plan = {"indexes": set(), "full_scan": False, "sort": False, "lines": []}
+    if connection.dialect.name == "sqlite":
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            detail = row[3]
+            plan["lines"].append(detail)
+            for name in re.findall(r"USING (?:COVERING )?INDEX (\w+)", detail):
+                # A non-integer PRIMARY KEY is served by an automatic index
+                plan["indexes"].add(PRIMARY if name.startswith("sqlite_autoindex_") else name)
+            if re.match(rf"SCAN {table_name}\b", detail) and "USING" not in detail:
+                plan["full_scan"] = True
+            if "USE TEMP B-TREE FOR" in detail and "ORDER BY" in detail:
+                plan["sort"] = True
+    elif connection.dialect.name == "mysql":
+        for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters).mappings():
+            extra = row.get("Extra") or ""
+            plan["lines"].append(f"{row['table']}: type={row['type']} key={row['key']} {extra}".strip())
+            if row["key"]:
+                plan["indexes"].add(row["key"])
+            if row["table"] == table_name and row["type"] == "ALL":
+                plan["full_scan"] = True
+            if "filesort" in extra:
+                plan["sort"] = True
+    else:
+        raise ValueError(f"EXPLAIN parsing is not implemented for {connection.dialect.name}")
+    return plan
+
+def suggested_index(clause, table) -> Optional[Tuple[str, ...]]:
+    """
+    Equality-filtered columns followed by ORDER BY columns of a statement.
+
+    ORDER BY stops counting at the first expression that is not a column
+    of the table, e.g. a relevance score. Trailing primary key columns are
+    left out: InnoDB appends the primary key to every secondary index.
+    """
+    table_name = table.name
+    whereclause = getattr(clause, "whereclause", None)
+    columns = []
+    if whereclause is not None:
+        for element in visitors.iterate(whereclause):
+            if not isinstance(element, BinaryExpression) or element.operator is not operators.eq:
+                continue
+            left, right = element.left, element.right
+            if getattr(getattr(left, "table", None), "name", None) == table_name and \
+                    isinstance(right, (BindParameter, False_, True_)) and left.name not in columns:
+                columns.append(left.name)
+    for order in getattr(clause, "_order_by_clauses", ()):
+        column = order.element if isinstance(order, UnaryExpression) else order
+        if getattr(getattr(column, "table", None), "name", None) != table_name:
+            break
+        if column.name not in columns:
+            columns.append(column.name)
+    primary_key = {column.name for column in table.primary_key.columns}
+    while columns and columns[-1] in primary_key:
+        columns.pop()
+    return tuple(columns) or None
+
+def analyze(bind, table) -> dict:
+    """
+    Schema drift, redundant, unused and missing indexes for table.
+
+    bind is an Engine, or a Connection whose open transaction is kept:
+    the workload then runs in a SAVEPOINT.
+    """
+    table_name = table.name
+    live = live_indexes(bind, table_name)
+    declared = declared_indexes(table)
+    live_names = {index["name"] for index in live}
+    declared_names = {index["name"] for index in declared}
+    if bind.dialect.name != "mysql":
+        declared_names -= {index["name"] for index in declared if index["fulltext"]}
+
+    redundant = redundant_indexes(live, table_name)
+    kept = [index for index in live if index["name"] not in {index["name"] for index, _ in redundant}]
+
+    used: Dict[str, List[str]] = {}
+    missing: Dict[Tuple[str, ...], List[str]] = {}
+    statements = []
+    with (bind.connect() if isinstance(bind, Engine) else nullcontext(bind)) as connection:
+        transaction = connection.begin_nested() if connection.in_transaction() else connection.begin()
+        try:
+            for captured in capture_statements(connection, table_name):
+                plan = explain(connection, captured["statement"], captured["parameters"], table_name)
+                statements.append({**captured, "plan": plan})
+                for name in plan["indexes"]:
+                    used.setdefault(name, []).append(captured["operation"])
+                if plan["full_scan"] or plan["sort"]:
+                    columns = suggested_index(captured["clause"], table)
+                    served = columns and any(
+                        tuple(index["column_names"])[:len(columns)] == columns for index in kept
+                    )
+                    if columns and not served:
+                        missing.setdefault(columns, []).append(captured["operation"])
+        finally:
+            transaction.rollback()
+
+    unused = [
+        index for index in kept
+        if not index["unique"] and not index["fulltext"] and index["name"] not in used
+    ]
+    return {
+        "dialect": bind.dialect.name,
+        "not_in_database": sorted(declared_names - live_names),
+        "not_in_model": sorted(live_names - declared_names - {PRIMARY}),
+        "redundant": redundant,
+        "unused": unused,
+        "missing": [
+            {"name": "idx_" + "_".join(columns), "column_names": list(columns), "operations": sorted(set(operations))}
+            for columns, operations in missing.items()
+        ],
+        "used": used,
+        "statements": statements,
+        "live": live,
+    }
+
+def print_report(report: dict, verbose: bool = False) -> None:
+    print(f"Indexes on users ({report['dialect']}):")
+    for index in report["live"]:
+        flags = ", ".join(flag for flag in ("unique" if index["unique"] else "", "fulltext" if index["fulltext"] else "") if flag)
+        uses = sorted(set(report["used"].get(index["name"], [])))
+        print(f"  {index['name']} ({', '.join(index['column_names'])}){' ' + flags if flags else ''}"
+              f" - used by: {', '.join(uses) or 'nothing'}")
+    if report["not_in_database"]:
+        print(f"Declared on the model but missing in the database: {', '.join(report['not_in_database'])}")
+    if report["not_in_model"]:
+        print(f"In the database but not on the model: {', '.join(report['not_in_model'])}")
+    print("Redundant:")
+    for index, reason in report["redundant"]:
+        print(f"  {index['name']}: {reason}")
+    print("Unused by the workload:")
+    for index in report["unused"]:
+        print(f"  {index['name']}")
+    print("Missing:")
+    for index in report["missing"]:
+        print(f"  {index['name']} ({', '.join(index['column_names'])}) for {', '.join(index['operations'])}")
+    if verbose:
+        print("Plans:")
+        for statement in report["statements"]:
+            print(f"  [{statement['operation']}] {' '.join(statement['statement'].split())[:160]}")
+            for line in statement["plan"]["lines"]:
+                print(f"      {line}")
+
+def write_migration(report: dict, message: str, drop: List[str]) -> str:
+    """Generate an Alembic revision applying the report; returns its path."""
+    from alembic import util
+    from alembic.autogenerate import render_python_code
+    from alembic.config import Config
+    from alembic.operations import ops
+    from alembic.script import ScriptDirectory
+
+    live = {index["name"]: index for index in report["live"]}
+    unknown = [name for name in drop if name not in live]
+    if unknown:
+        raise SystemExit(f"Not indexes on users: {', '.join(unknown)}")
+    dropped = [index for index, _ in report["redundant"]] + [live[name] for name in drop]
+    dropped = list({index["name"]: index for index in dropped}.values())
+
+    upgrade = [ops.CreateIndexOp(index["name"], "users", index["column_names"]) for index in report["missing"]]
+    upgrade += [ops.DropIndexOp(index["name"], table_name="users") for index in dropped]
+    downgrade = [ops.CreateIndexOp(index["name"], "users", index["column_names"], unique=index["unique"])
+                 for index in reversed(dropped)]
+    downgrade += [ops.DropIndexOp(index["name"], table_name="users") for index in reversed(report["missing"])]
+
+    script_directory = ScriptDirectory.from_config(Config("alembic.ini"))
+    script = script_directory.generate_revision(
+        util.rev_id(), message, head="head",
+        upgrades=render_python_code(ops.UpgradeOps(ops=upgrade)).strip(),
+        downgrades=render_python_code(ops.DowngradeOps(ops=downgrade)).strip(),
+    )
+    return script.path
+
+def main():
+    parser = argparse.ArgumentParser(description="Report redundant, unused and missing indexes on users")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print every statement and its plan")
+    parser.add_argument("--write-migration", action="store_true", help="Write an Alembic revision applying the advice")
+    parser.add_argument("-m", "--message", default="consolidate user indexes", help="Revision message")
+    parser.add_argument("--drop", action="append", default=[], metavar="INDEX", help="Also drop this index (repeatable)")
+    args = parser.parse_args()
+
+    report = analyze(get_database().engine, User.__table__)
+    print_report(report, args.verbose)
+    if args.write_migration:
+        print(f"Wrote {write_migration(report, args.message, args.drop)}")
+
+if __name__ == "__main__":
+    main()
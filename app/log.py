@@ -0,0 +1,144 @@
+"""
+Queue-based logging setup.
+
+Request threads only put LogRecords on a bounded in-memory queue; a
+QueueListener thread formats them (as JSON by default) and writes them to
+the file and stream handlers. When the queue is full the record is dropped
+and counted instead of blocking the request. Records are not formatted on
+the request thread, so %-style arguments, including PIIHash values, are only
+rendered for records that are actually written.
+"""
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import random
+from app.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# The listener started by the latest setup_logging call
+_listener: Optional[QueueListener] = None
+
+class PIIHash:
+    """Log argument rendering a keyed, truncated SHA-256 of a PII value only when formatted."""
+    __slots__ = ("value", "secret")
+
+    def __init__(self, value: str, secret: str):
+        self.value = value
+        self.secret = secret
+
+    def __str__(self) -> str:
+        return hashlib.sha256(f"{self.secret}{self.value}".encode('utf-8')).hexdigest()[:16]
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO and DEBUG records for selected loggers.
+
+    rates maps a logger name (or a parent's name) to the fraction to keep.
+    WARNING and above always pass.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate is None or random.random() < rate
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record can be handed over
+        # as is and formatted on the writer thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+def stop_logging() -> None:
+    """Drain the queue, then stop the listener thread and close its handlers."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+def setup_logging(settings) -> QueueListener:
+    """
+    Route the root logger through a bounded queue to the configured handlers.
+
+    Calling it again (create_app does, once per app) replaces the previous
+    listener, its thread and its handlers instead of adding to them.
+    """
+    global _listener
+    if settings.LOG_FORMAT == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if settings.LOG_FILE:
+        handlers.insert(0, RotatingFileHandler(
+            settings.LOG_FILE,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    stop_logging()
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listener = listener
+    return listener
+
+atexit.register(stop_logging)
@@ -1,71 +1,234 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+"""
+Application factory.
+
+create_app(settings) configures logging, middleware and routes; the
+database engines are built (and, with SERVER_WARMUP, pre-connected) when
+the application starts (lifespan) and disposed when it stops. Importing this module has no side effects:
+`app.main:app` still works for uvicorn and gunicorn and builds the default
+application on first access, or use `uvicorn --factory app.main:create_app`.
+"""
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING
 from app.config import get_settings
-from app.api.v1 import users
-from app.database import engine, Base
+import asyncio
 import logging
-import logging.handlers
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.handlers.RotatingFileHandler(
-            'app.log',
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5
-        ),
-        logging.StreamHandler()
-    ]
-)
+import time
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
 
 logger = logging.getLogger(__name__)
 
-settings = get_settings()
-
-# Database migrations handled by Alembic
-# Run: alembic upgrade head
-logger.info("Using Alembic for database migrations")
-
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
-
-app = FastAPI(
-    title=settings.APP_NAME,
-    version=settings.APP_VERSION,
-    description="Production-grade User Management System with best practices",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Application started with rate limiting enabled")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(users.router, prefix=settings.API_V1_PREFIX)
-
-@app.get("/")
-def root():
-    return {
-        "message": "User Management System API",
-        "version": settings.APP_VERSION,
-        "docs": "/docs"
-    }
-
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+def purge_idempotency_keys():
+    from app.database import get_database
+    from app.services.idempotency_service import IdempotencyService
+
+    db = get_database().SessionLocal()
+    try:
+        IdempotencyService.purge_expired(db)
+    finally:
+        db.close()
+
+def archive_deleted_users():
+    from app.database import get_database
+    from app.services.retention_service import RetentionService
+
+    db = get_database().SessionLocal()
+    try:
+        RetentionService.archive_deleted_users(db)
+    finally:
+        db.close()
+
+def refresh_name_index():
+    from app.database import get_database
+    from app.services.autocomplete import name_index
+
+    db = get_database().SessionLocal()
+    try:
+        name_index.refresh(db, get_settings().AUTOCOMPLETE_MAX_ENTRIES)
+    finally:
+        db.close()
+
+async def warm_up(database, settings) -> None:
+    """
+    Open each pool's connections and run the default list page.
+
+    Runs before the worker accepts traffic, so the first requests do not pay
+    for connection setup, statement compilation or a cold count cache.
+    """
+    from app.services.user_service import UserService
+
+    started = time.perf_counter()
+
+    def warm_sync():
+        for engine in [database.engine, *database.replica_engines]:
+            connections = []
+            try:
+                for _ in range(engine.pool.size()):
+                    connections.append(engine.connect())
+            finally:
+                for connection in connections:
+                    connection.close()
+        db = database.SessionLocal()
+        try:
+            UserService.get_all_users(db, 1, settings.DEFAULT_PAGE_SIZE, count="estimated")
+        finally:
+            db.close()
+
+    await run_in_threadpool(warm_sync)
+    for engine in filter(None, [database.async_engine, *database.async_replica_engines]):
+        connections = []
+        try:
+            for _ in range(engine.pool.size()):
+                connections.append(await engine.connect())
+        finally:
+            for connection in connections:
+                await connection.close()
+    logger.info("Worker warmed up in %.0f ms", (time.perf_counter() - started) * 1000)
+
+async def run_periodically(interval: int, job, description: str, immediately: bool = False):
+    if not immediately:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except Exception:
+            logger.exception("Failed to %s", description)
+        await asyncio.sleep(interval)
+
+def lifespan(settings):
+    @asynccontextmanager
+    async def run(app: "FastAPI"):
+        from app.database import close_database, init_database
+        from app.pool import report_leaks
+
+        # Request sessions come from this app's Database even if another
+        # app in the process has replaced the current one since
+        database = app.state.database = init_database(settings)
+        if settings.SERVER_WARMUP:
+            try:
+                await warm_up(database, settings)
+            except Exception:
+                logger.exception("Warm-up failed; starting cold")
+        background_tasks = [
+            asyncio.create_task(run_periodically(
+                settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS, purge_idempotency_keys, "purge expired idempotency keys"
+            )),
+            asyncio.create_task(run_periodically(
+                settings.RETENTION_INTERVAL_SECONDS, archive_deleted_users, "archive deleted users"
+            )),
+            asyncio.create_task(run_periodically(
+                settings.DB_LEAK_THRESHOLD_SECONDS, report_leaks, "report long-held connections"
+            )),
+        ]
+        if settings.AUTOCOMPLETE_ENABLED:
+            # Built in the background; autocomplete queries the database until then
+            background_tasks.append(asyncio.create_task(run_periodically(
+                settings.AUTOCOMPLETE_REFRESH_SECONDS, refresh_name_index, "refresh the autocomplete index",
+                immediately=True
+            )))
+        logger.info("Application started with rate limiting enabled")
+        try:
+            yield
+        finally:
+            for task in background_tasks:
+                task.cancel()
+            app.state.database = None
+            await close_database(database)
+    return run
+
+def create_app(settings=None) -> "FastAPI":
+    """Build the application for settings (default get_settings())."""
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import PlainTextResponse
+    from slowapi import Limiter, _rate_limit_exceeded_handler
+    from slowapi.util import get_remote_address
+    from slowapi.errors import RateLimitExceeded
+    from app.api.v1 import users
+    from app.log import setup_logging
+    from app.metrics import MetricsMiddleware, render_metrics
+    from app.routing import ReadYourWritesMiddleware
+
+    settings = settings or get_settings()
+    setup_logging(settings)
+
+    # Database migrations handled by Alembic
+    # Run: alembic upgrade head
+    logger.info("Using Alembic for database migrations")
+
+    limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
+
+    app = FastAPI(
+        title=settings.APP_NAME,
+        version=settings.APP_VERSION,
+        description="Production-grade User Management System with best practices",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan(settings)
+    )
+
+    app.state.settings = settings
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Each add_middleware call wraps everything added before it, so the
+    # middleware added last runs first on a request.
+
+    # Pin a client's reads to the primary for a short window after it writes
+    if settings.DATABASE_REPLICA_URLS and settings.READ_YOUR_WRITES_SECONDS > 0:
+        app.add_middleware(ReadYourWritesMiddleware, window=settings.READ_YOUR_WRITES_SECONDS)
+
+    # Per-request latency, SQL statement count and DB time; added last so it
+    # is outermost and also times the other middleware and rate limiting.
+    if settings.METRICS_ENABLED:
+        app.add_middleware(
+            MetricsMiddleware,
+            server_timing_threshold=(
+                settings.SERVER_TIMING_THRESHOLD_MS / 1000
+                if settings.SERVER_TIMING_THRESHOLD_MS is not None else None
+            ),
+        )
+
+    app.include_router(users.router, prefix=settings.API_V1_PREFIX)
+
+    @app.get("/")
+    def root():
+        return {
+            "message": "User Management System API",
+            "version": settings.APP_VERSION,
+            "docs": "/docs"
+        }
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus text exposition of this worker's metrics, labelled with its pid."""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+_app = None
+
+def __getattr__(name: str):
+    # `app` and `limiter` are built on first access for `app.main:app` and
+    # existing imports
+    global _app
+    if name in ("app", "limiter"):
+        if _app is None:
+            _app = create_app()
+        return _app if name == "app" else _app.state.limiter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,224 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Kept dependency-free and cheap enough to leave on in production: an
+observation is a bisect and a few additions under a lock. Values are per
+worker process and nothing is shared between workers: every series carries
+a pid label, so a scrape answered by any one worker adds or continues that
+worker's series instead of overwriting another's. Aggregate across workers
+in queries, e.g. sum without (pid) (rate(...)).
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels.items()]
+    pairs.append(f'pid="{os.getpid()}"')
+    return "{" + ",".join(pairs) + "}"
+
+Sample = Tuple[str, Dict[str, str], float]
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterator[Sample]:
+        """Current (name, labels, value) samples, without the pid label."""
+        return iter(())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+class Gauge(Metric):
+    """Point-in-time values, read from collect() at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Callable[[], Dict[Tuple[str, ...], float]] = dict):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self.collect().items():
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in items:
+            names = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", {**names, "le": le}, cumulative
+            yield f"{self.name}_sum", names, total
+            yield f"{self.name}_count", names, count
+
+REGISTRY: List[Metric] = []
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request", ("method", "route")
+)
+DB_STATEMENTS = Counter("db_statements_total", "SQL statements executed")
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",)
+)
+
+def get_sample_value(name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+    """This worker's value of one sample, like prometheus_client's REGISTRY.get_sample_value."""
+    labels = labels or {}
+    for metric in REGISTRY:
+        for sample_name, sample_labels, value in metric.samples():
+            if sample_name == name and sample_labels == labels:
+                return value
+    return None
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class RequestStats:
+    """Per-request accumulator, shared by reference with threadpool workers."""
+    __slots__ = ("statements", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+# The start time lives on the statement's execution context, not the
+# connection: after_cursor_execute never runs for a statement that raises,
+# and a per-connection stack would then pair later statements with it
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "query_start_time", None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    DB_STATEMENTS.inc()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+
+def record_pool_wait(elapsed: float, pool: str = "default") -> None:
+    POOL_CHECKOUT_WAIT.observe(elapsed, pool)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.pool_wait += elapsed
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request and its database work.
+
+    Routes are labelled by their path template, never the raw path, to
+    keep label cardinality bounded. With server_timing_threshold set,
+    requests at least that slow get a Server-Timing header with app, db
+    and pool-wait durations.
+    """
+
+    def __init__(self, app, server_timing_threshold: Optional[float] = None):
+        self.app = app
+        self.server_timing_threshold = server_timing_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - started
+                if self.server_timing_threshold is not None and elapsed >= self.server_timing_threshold:
+                    header = (
+                        f'app;dur={elapsed * 1000:.1f}, '
+                        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries", '
+                        f'pool;dur={stats.pool_wait * 1000:.1f}'
+                    )
+                    message.setdefault("headers", []).append((b"server-timing", header.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            route_label = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, route_label, str(status_code))
+            REQUEST_DB_STATEMENTS.observe(stats.statements, method, route_label)
+            REQUEST_DB_TIME.observe(stats.db_time, method, route_label)
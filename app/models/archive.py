@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Index, Table
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.types import Timestamp
+from app.models.user import User
+
+# Columns carried between users and users_archive
+ARCHIVED_COLUMNS = [column.name for column in User.__table__.columns]
+
+class UserArchive(Base):
+    """
+    Soft-deleted users moved out of the hot table by the retention job.
+
+    Mirrors the users columns without their unique indexes, so archived
+    values never block new registrations; rows move back on restore.
+    """
+    __table__ = Table(
+        "users_archive",
+        Base.metadata,
+        *(
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in User.__table__.columns
+        ),
+        Column("archived_at", Timestamp, server_default=func.now(), nullable=False),
+        Index("ix_users_archive_email", "email"),
+        Index("ix_users_archive_archived_at", "archived_at"),
+    )
+
+    def __repr__(self):
+        return f"<UserArchive(id={self.id}, email={self.email})>"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.types import BinaryUUID, Timestamp
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    user_id = Column(BinaryUUID, nullable=False, comment="User created by the original request")
+    request_hash = Column(String(64), nullable=False, comment="SHA-256 of the original request body")
+    created_at = Column(Timestamp, server_default=func.now(), nullable=False)
+    expires_at = Column(Timestamp, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key={self.key}, user_id={self.user_id})>"
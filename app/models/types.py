@@ -0,0 +1,36 @@
+from sqlalchemy import BINARY, DateTime
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.types import TypeDecorator
+import uuid
+
+# MySQL DATETIME columns (and SQLite's CURRENT_TIMESTAMP) have second precision.
+# Store Python-bound datetimes the same way on SQLite so keyset comparisons
+# against server-generated timestamps match exactly.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
+class BinaryUUID(TypeDecorator):
+    """
+    UUID stored as BINARY(16) and exposed as its canonical string.
+
+    Sixteen bytes instead of a 36-character string keeps the clustered
+    primary key and every secondary index (which carries the key) small.
+    Strings that are not UUIDs raise ValueError; services answer malformed
+    ids from requests with 404 before they reach a query.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return value.bytes
+        return uuid.UUID(value).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -1,14 +1,18 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Date, Text, Index
+from sqlalchemy import Column, String, DateTime, Boolean, Date, Text, Index, DDL, event
+from sqlalchemy.orm import deferred, validates
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.types import BinaryUUID, Timestamp
+from app.utils.ids import new_user_id
 import uuid
 
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(BinaryUUID, primary_key=True, default=new_user_id)
     name = Column(String(255), nullable=False, index=True)
     email = Column(String(255), nullable=False, unique=True, index=True)
+    email_domain = Column(String(255), nullable=True, index=True, comment="Lower-cased domain part of email, for domain search")
     primary_mobile = Column(String(15), nullable=False, unique=True, index=True)
     secondary_mobile = Column(String(15), nullable=True)
     aadhaar = Column(String(12), nullable=False, unique=True, index=True)
@@ -17,12 +21,12 @@ class User(Base):
     place_of_birth = Column(String(255), nullable=False)
     current_address = Column(Text, nullable=False)
     permanent_address = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now(), nullable=False)
+    updated_at = Column(Timestamp, onupdate=func.now(), server_default=func.now())
     created_by = Column(String(36), nullable=True)
     updated_by = Column(String(36), nullable=True)
-    is_deleted = Column(Boolean, default=False, nullable=False, index=True)
-    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    is_deleted = Column(Boolean, default=False, nullable=False)
+    deleted_at = Column(Timestamp, nullable=True)
     deleted_by = Column(String(36), nullable=True)
     version = Column(String(36), default=lambda: str(uuid.uuid4()), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -30,19 +34,50 @@ class User(Base):
     mobile_verified = Column(Boolean, default=False, nullable=False)
     last_login_at = Column(DateTime(timezone=True), nullable=True)
     
-    # New fields for testing Alembic
-    profile_picture = Column(String(500), nullable=True, comment="URL to profile picture")
-    bio = Column(Text, nullable=True, comment="User bio/description")
+    # New fields for testing Alembic. Not part of any response, so deferred:
+    # loaded only when accessed.
+    profile_picture = deferred(Column(String(500), nullable=True, comment="URL to profile picture"))
+    bio = deferred(Column(Text, nullable=True, comment="User bio/description"))
     preferred_language = Column(String(10), default='en', nullable=False, comment="Language preference (en, hi, etc)")
     
+    # Unique lookups use the ix_users_* unique indexes; python -m app.jobs.indexes
+    # checks this set against the statements UserService runs.
     __table_args__ = (
-        Index('idx_active_email', 'is_deleted', 'email'),
-        Index('idx_active_mobile', 'is_deleted', 'primary_mobile'),
-        Index('idx_active_aadhaar', 'is_deleted', 'aadhaar'),
-        Index('idx_active_pan', 'is_deleted', 'pan'),
-        Index('idx_name_search', 'name'),
-        Index('idx_created_at', 'created_at'),
+        Index('idx_is_deleted_created_at', 'is_deleted', 'created_at'),
+        Index('idx_deleted_at', 'is_deleted', 'deleted_at'),
+        # Changed-since reads: the change feed's keyset order and the autocomplete
+        # catch-up. Creates, updates and soft deletes all set updated_at
+        Index('idx_updated_at_id', 'updated_at', 'id'),
+        Index('ft_users_name_email', 'name', 'email', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),
     )
     
+    @staticmethod
+    def domain_of(email: str) -> str:
+        return email.rsplit('@', 1)[-1].lower()
+    
+    @validates('email')
+    def _sync_email_domain(self, key, value):
+        self.email_domain = User.domain_of(value) if value else None
+        return value
+    
     def __repr__(self):
-        return f"<User(id={self.id}, name={self.name}, email={self.email})>"
\ No newline at end of file
+        return f"<User(id={self.id}, name={self.name}, email={self.email})>"
+
+# SQLite full-text index for local runs and tests: an external-content FTS5
+# table over users.rowid, kept in sync by triggers. The trigram tokenizer
+# gives substring matching like MySQL's ngram parser.
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "name, email, content='users', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.rowid, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF name, email ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.rowid, old.name, old.email); "
+    "INSERT INTO users_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(User.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(User.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect='sqlite'))
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Connection pool sizing and telemetry.
+
+Pool sizes come from a connection budget per database server shared by all
+worker processes, so adding workers shrinks each pool instead of
+overrunning max_connections. Every engine gets a PoolMonitor that records
+checkout waits and hold times, and remembers where each checked-out
+connection was taken so connections held past DB_LEAK_THRESHOLD_SECONDS
+can be reported with their checkout stack.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Dict, List, Tuple
+import logging
+import sys
+import threading
+import time
+import traceback
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 30
+
+def pool_options(settings, engines_per_server: int = 1) -> dict:
+    """
+    create_engine pool arguments for one engine in one worker.
+
+    DB_CONNECTION_BUDGET is split across WEB_CONCURRENCY workers and the
+    engines each worker opens to the same server; a third of a share is
+    kept open and the rest is overflow. DB_POOL_SIZE and DB_MAX_OVERFLOW
+    override the derived values.
+    """
+    share = max(1, settings.DB_CONNECTION_BUDGET // (settings.WEB_CONCURRENCY * engines_per_server))
+    pool_size = settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else max(1, share // 3)
+    max_overflow = settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else max(0, share - pool_size)
+    total = (pool_size + max_overflow) * settings.WEB_CONCURRENCY * engines_per_server
+    if total > settings.DB_CONNECTION_BUDGET:
+        logger.warning(
+            "Pool settings allow %s connections per server, over DB_CONNECTION_BUDGET=%s",
+            total, settings.DB_CONNECTION_BUDGET
+        )
+    return dict(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+POOL_CHECKOUT_TIMEOUTS = metrics.Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout", ("pool",)
+)
+
+class TimedPoolMixin:
+    """Records how long each pool checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(1, self._orig_logging_name or "default")
+            raise
+        finally:
+            metrics.record_pool_wait(time.perf_counter() - started, self._orig_logging_name or "default")
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+POOL_CONNECTION_HELD = metrics.Histogram(
+    "db_pool_connection_held_seconds", "Time a connection stayed checked out of the pool", ("pool",)
+)
+POOL_LONG_HELD = metrics.Counter(
+    "db_pool_long_held_total", "Connections returned after more than DB_LEAK_THRESHOLD_SECONDS", ("pool",)
+)
+
+class PoolMonitor:
+    """Tracks the connections checked out of one engine's pool."""
+
+    def __init__(self, engine: Engine, name: str, leak_threshold: float, track_stacks: bool = True):
+        self.engine = engine
+        self.name = name
+        self.leak_threshold = leak_threshold
+        self.track_stacks = track_stacks
+        # id(connection record) -> (checked out at, stack, reported)
+        self._active: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        MONITORS.append(self)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        stack = checkout_stack() if self.track_stacks else None
+        with self._lock:
+            self._active[id(connection_record)] = [time.monotonic(), stack, False]
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            entry = self._active.pop(id(connection_record), None)
+        if entry is None:
+            return
+        held = time.monotonic() - entry[0]
+        POOL_CONNECTION_HELD.observe(held, self.name)
+        if held > self.leak_threshold:
+            POOL_LONG_HELD.inc(1, self.name)
+            if not entry[2]:
+                self._report(held, entry[1], "returned")
+
+    def _report(self, held: float, stack, state: str) -> None:
+        logger.warning(
+            "Connection from pool %s %s after %.1fs; checked out at:\n%s",
+            self.name, state, held, format_stack(stack)
+        )
+
+    def close(self) -> None:
+        """Stop tracking the engine, e.g. before it is disposed."""
+        event.remove(self.engine, "checkout", self._on_checkout)
+        event.remove(self.engine, "checkin", self._on_checkin)
+        MONITORS.remove(self)
+
+    def held_too_long(self) -> int:
+        cutoff = time.monotonic() - self.leak_threshold
+        with self._lock:
+            return sum(1 for started, _, _ in self._active.values() if started < cutoff)
+
+    def report_leaks(self) -> int:
+        """Log each connection still checked out past the threshold, once; returns how many are held."""
+        now = time.monotonic()
+        reports: List[Tuple[float, object]] = []
+        held = 0
+        with self._lock:
+            for entry in self._active.values():
+                if now - entry[0] > self.leak_threshold:
+                    held += 1
+                    if not entry[2]:
+                        entry[2] = True
+                        reports.append((now - entry[0], entry[1]))
+        for age, stack in reports:
+            self._report(age, stack, "still checked out")
+        return held
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": getattr(pool, "_max_overflow", 0),
+            "held_too_long": self.held_too_long(),
+        }
+
+def checkout_stack() -> List[Tuple[str, int, str]]:
+    """
+    (filename, line, function) of the frames that checked a connection out.
+
+    Only code locations are kept, innermost first, so this costs a frame
+    walk; source lines are read only if the stack is ever reported.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        code = frame.f_code
+        if "/sqlalchemy/" not in code.co_filename and code.co_filename != __file__:
+            frames.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return frames
+
+def format_stack(stack) -> str:
+    """Checkout stack formatted like a traceback, innermost last."""
+    if stack is None:
+        return "  (DB_TRACK_CHECKOUT_STACKS is off)"
+    return "".join(traceback.format_list(
+        [traceback.FrameSummary(filename, line, name) for filename, line, name in reversed(stack)]
+    ))
+
+MONITORS: List[PoolMonitor] = []
+
+def _collect(key: str):
+    return lambda: {(monitor.name,): monitor.stats()[key] for monitor in MONITORS}
+
+metrics.Gauge("db_pool_size", "Connections the pool keeps open", ("pool",), _collect("size"))
+metrics.Gauge("db_pool_checked_out", "Connections currently in use", ("pool",), _collect("checked_out"))
+metrics.Gauge("db_pool_idle", "Open connections waiting in the pool", ("pool",), _collect("idle"))
+metrics.Gauge("db_pool_overflow", "Connections open beyond pool_size", ("pool",), _collect("overflow"))
+metrics.Gauge("db_pool_max_overflow", "Configured max_overflow", ("pool",), _collect("max_overflow"))
+metrics.Gauge(
+    "db_pool_held_too_long", "Connections checked out for more than DB_LEAK_THRESHOLD_SECONDS",
+    ("pool",), _collect("held_too_long")
+)
+
+def report_leaks() -> None:
+    for monitor in MONITORS:
+        monitor.report_leaks()
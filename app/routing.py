@@ -0,0 +1,129 @@
+"""
+Read/write splitting across a primary and its read replicas.
+
+Sessions read from one replica and switch to the primary for good on their
+first flush, DML statement or SELECT ... FOR UPDATE. Read-your-writes is
+kept in two ways for READ_YOUR_WRITES_SECONDS after a write: the writing
+client gets a cookie pinning its requests to the primary, and the worker
+remembers the written user's version so nobody caches a stale replica copy.
+"""
+from http.cookies import SimpleCookie
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from typing import List, Optional
+import itertools
+import threading
+from app.cache.backends import MemoryCache
+from app.config import get_settings
+
+PRIMARY_COOKIE = "read_primary"
+
+class ReplicaSet:
+    """
+    Picks a read replica per session.
+
+    round_robin cycles through the replicas; least_connections takes the one
+    with the fewest connections checked out of its pool.
+    """
+
+    def __init__(self, engines: List[Engine], strategy: str = "round_robin"):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica routing strategy: {strategy}")
+        self.engines = engines
+        self.strategy = strategy
+        self._cycle = itertools.cycle(engines)
+        self._lock = threading.Lock()
+
+    def choose(self) -> Engine:
+        if self.strategy == "least_connections":
+            return min(self.engines, key=lambda engine: engine.pool.checkedout())
+        with self._lock:
+            return next(self._cycle)
+
+class RoutingSession(Session):
+    """Session sending reads to a replica and writes to the primary; info['use_primary'] pins it."""
+    primary: Optional[Engine] = None
+    replicas: Optional[ReplicaSet] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replicas is None or self.info.get('use_primary'):
+            return self.primary
+        if self._flushing or isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None:
+            self.info['use_primary'] = True
+            return self.primary
+        if 'replica' not in self.info:
+            self.info['replica'] = self.replicas.choose()
+        return self.info['replica']
+
+def routing_session_class(primary: Engine, replicas: Optional[ReplicaSet] = None) -> type:
+    """RoutingSession subclass bound to one primary and its replicas."""
+    return type("RoutingSession", (RoutingSession,), {"primary": primary, "replicas": replicas})
+
+class RecentWrites:
+    """
+    Users written by this worker within the read-your-writes window.
+
+    Always in process memory, even with the entity cache disabled; a write
+    handled by another worker is covered by the client's cookie instead.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.backend = MemoryCache(max_entries=max_entries)
+
+    def record(self, user_id: str, version: str) -> None:
+        window = get_settings().READ_YOUR_WRITES_SECONDS
+        if window > 0:
+            self.backend.set(str(user_id), version, window)
+
+    def version(self, user_id: str) -> Optional[str]:
+        """Version written within the window, or None."""
+        return self.backend.get(str(user_id))[1]
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+recent_writes = RecentWrites()
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+# Endpoints that take a request body but only read, e.g. batch lookups
+READ_ONLY_ENDPOINTS = set()
+
+def read_only(endpoint):
+    """Mark a POST endpoint as a read: it may use a replica and does not pin the client to the primary."""
+    READ_ONLY_ENDPOINTS.add(endpoint)
+    return endpoint
+
+def is_write(scope) -> bool:
+    """Whether a request may write; the matched endpoint is known once routing has run."""
+    return scope["method"] not in READ_METHODS and scope.get("endpoint") not in READ_ONLY_ENDPOINTS
+
+class ReadYourWritesMiddleware:
+    """
+    Sets the read_primary cookie on successful write responses.
+
+    Only the cookie's presence matters: it expires after
+    READ_YOUR_WRITES_SECONDS, and while it is present the client's reads
+    use the primary.
+    """
+
+    def __init__(self, app, window: int):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and 200 <= message["status"] < 300 and is_write(scope):
+                headers = list(message.get("headers", []))
+                cookie = SimpleCookie()
+                cookie[PRIMARY_COOKIE] = "1"
+                cookie[PRIMARY_COOKIE].update({"max-age": self.window, "path": "/", "httponly": True, "samesite": "Lax"})
+                headers.append((b"set-cookie", cookie.output(header="").strip().encode('latin-1')))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, create_model, field_validator
 from datetime import date, datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple, Type
 from app.utils.validators import Validators
 
 class UserBase(BaseModel):
@@ -51,6 +52,15 @@ class UserUpdate(BaseModel):
     current_address: Optional[str] = Field(None, min_length=10, max_length=1000)
     permanent_address: Optional[str] = Field(None, min_length=10, max_length=1000)
     is_active: Optional[bool] = None
+    version: Optional[str] = Field(None, description="Version the update is based on; rejected with 412 if the user has changed since (same as If-Match)")
+    
+    @field_validator('name', 'email', 'primary_mobile', 'current_address', 'permanent_address', 'is_active')
+    @classmethod
+    def reject_null(cls, v):
+        # Omitting a field leaves it unchanged; these columns cannot be cleared
+        if v is None:
+            raise ValueError('Cannot be null')
+        return v
 
 class UserResponse(UserBase):
     """Schema for user response"""
@@ -66,8 +76,91 @@ class UserResponse(UserBase):
 
 class PaginatedUserResponse(BaseModel):
     """Schema for paginated response"""
-    total: int
+    total: Optional[int] = Field(..., description="Total matching users; null when count=none")
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = Field(..., description="Total pages; null when count=none")
+    count_mode: str = Field("exact", description="How total was produced: exact, estimated or none")
+    has_more: bool = Field(..., description="Whether another page follows this one")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
     data: list[UserResponse]
+
+@lru_cache(maxsize=256)
+def projected_user_response(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """UserResponse limited to fields, for fields= projections."""
+    return create_model(
+        "UserFieldsResponse",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (UserResponse.model_fields[name].annotation, UserResponse.model_fields[name]) for name in fields}
+    )
+
+@lru_cache(maxsize=256)
+def projected_paginated_response(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """PaginatedUserResponse whose items are limited to fields."""
+    return create_model(
+        "PaginatedUserFieldsResponse",
+        __base__=PaginatedUserResponse,
+        data=(list[projected_user_response(fields)], ...)
+    )
+
+class UserLookupRequest(BaseModel):
+    """Schema for batch lookup by id and exact identifier values"""
+    id: list[str] = Field(default_factory=list, description="User ids")
+    email: list[str] = Field(default_factory=list, description="Exact email addresses")
+    primary_mobile: list[str] = Field(default_factory=list, description="Exact primary mobile numbers")
+    aadhaar: list[str] = Field(default_factory=list, description="Exact Aadhaar numbers")
+    pan: list[str] = Field(default_factory=list, description="Exact PAN numbers")
+
+class UserLookupResult(BaseModel):
+    """Outcome of one looked-up value"""
+    value: str = Field(..., description="The value as sent")
+    found: bool = Field(..., description="False when no active user has this value")
+    user: Optional[UserResponse] = None
+
+class UserLookupResponse(BaseModel):
+    """Schema for batch lookup results; each list follows the order of the request's list"""
+    found: int
+    missed: int
+    id: list[UserLookupResult] = []
+    email: list[UserLookupResult] = []
+    primary_mobile: list[UserLookupResult] = []
+    aadhaar: list[UserLookupResult] = []
+    pan: list[UserLookupResult] = []
+
+class UserNameMatch(BaseModel):
+    """One autocomplete suggestion"""
+    id: str
+    name: str
+
+class UserAutocompleteResponse(BaseModel):
+    """Schema for autocomplete suggestions, in name order"""
+    prefix: str
+    data: list[UserNameMatch]
+
+class UserChange(BaseModel):
+    """One entry of the change feed; soft-deleted users are tombstones without user data"""
+    change: str = Field(..., description="created, updated or deleted")
+    id: str
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+    user: Optional[UserResponse] = Field(None, description="Current state; null for deleted users")
+
+class UserChangesResponse(BaseModel):
+    """Schema for a batch of the change feed, oldest change first"""
+    data: list[UserChange]
+    has_more: bool = Field(..., description="Whether more changes are ready now")
+    next_cursor: Optional[str] = Field(None, description="Pass as since to resume after this batch; null only before the first change")
+
+class BulkUserRowResult(BaseModel):
+    """Outcome of a single row in a bulk upload"""
+    row: int = Field(..., description="1-based position of the row in the upload")
+    status: str = Field(..., description="created or failed")
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkUserResponse(BaseModel):
+    """Schema for bulk upload report"""
+    total: int
+    created: int
+    failed: int
+    results: list[BulkUserRowResult]
\ No newline at end of file
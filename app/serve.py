@@ -0,0 +1,61 @@
+"""
+Production server entrypoint.
+
+    python -m app.serve
+    python -m app.serve --workers 4 --port 8000
+
+Runs uvicorn with the SERVER_* settings and WEB_CONCURRENCY worker
+processes (--workers overrides it). The worker count is exported as
+WEB_CONCURRENCY so each worker sizes its pools to its share of
+DB_CONNECTION_BUDGET. Each worker builds the application with create_app
+and, with SERVER_WARMUP, opens its pool and primes its caches during
+startup, before it accepts connections.
+"""
+import argparse
+import logging
+import os
+import uvicorn
+from app.config import get_settings
+from app.log import setup_logging
+from app.pool import pool_options
+
+logger = logging.getLogger(__name__)
+
+def uvicorn_options(settings, workers: int) -> dict:
+    return dict(
+        factory=True,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        # Logging goes through app.log's queue; per-request timings are in /metrics
+        log_config=None,
+        access_log=False,
+    )
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API with uvicorn worker processes")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY, help="Default: WEB_CONCURRENCY")
+    args = parser.parse_args()
+
+    # Workers (and a single in-process worker) read the budget share from
+    # WEB_CONCURRENCY
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    get_settings.cache_clear()
+    settings = get_settings()
+
+    setup_logging(settings)
+    pool = pool_options(settings, engines_per_server=2 if settings.DATABASE_ASYNC else 1)
+    logger.info(
+        "Starting %s workers on %s:%s; pool per worker %s + %s overflow of DB_CONNECTION_BUDGET=%s",
+        args.workers, args.host, args.port, pool["pool_size"], pool["max_overflow"], settings.DB_CONNECTION_BUDGET
+    )
+    uvicorn.run("app.main:create_app", host=args.host, port=args.port, **uvicorn_options(settings, args.workers))
+
+if __name__ == "__main__":
+    main()
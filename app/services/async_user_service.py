@@ -0,0 +1,67 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional, Union
+from app.models.user import User
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.user_service import UserService
+
+DBSession = Union[Session, AsyncSession]
+
+async def _run(db: DBSession, method, *args):
+    """
+    Run a UserService method without blocking the event loop.
+
+    On an AsyncSession the method runs through run_sync: its SQL is awaited
+    on the async driver and no thread is held, so concurrency is bounded by
+    the connection pool. A sync Session keeps the threadpool path.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(method, *args)
+    return await run_in_threadpool(method, db, *args)
+
+class AsyncUserService:
+    """Awaitable UserService operations for either session type."""
+
+    @staticmethod
+    async def create_user(db: DBSession, user_data: UserCreate) -> User:
+        return await _run(db, UserService.create_user, user_data)
+
+    @staticmethod
+    async def get_user_cached(db: DBSession, user_id: str) -> dict:
+        return await _run(db, UserService.get_user_cached, user_id)
+
+    @staticmethod
+    async def lookup_users(db: DBSession, values: dict, max_values: Optional[int] = None) -> dict:
+        return await _run(db, UserService.lookup_users, values, max_values)
+
+    @staticmethod
+    async def autocomplete_users(db: DBSession, prefix: str, limit: int = 10) -> List[dict]:
+        return await _run(db, UserService.autocomplete_users, prefix, limit)
+
+    @staticmethod
+    async def update_user(db: DBSession, user_id: str, user_data: UserUpdate,
+                          versions: Optional[List[str]] = None) -> User:
+        return await _run(db, UserService.update_user, user_id, user_data, versions)
+
+    @staticmethod
+    async def get_all_users(db: DBSession, page: int = 1, page_size: int = 10, cursor: Optional[str] = None,
+                            count: str = "exact", fields: Optional[List[str]] = None, as_rows: bool = False) -> dict:
+        return await _run(db, UserService.get_all_users, page, page_size, cursor, count, fields, as_rows)
+
+    @staticmethod
+    async def soft_delete_user(db: DBSession, user_id: str, versions: Optional[List[str]] = None) -> User:
+        return await _run(db, UserService.soft_delete_user, user_id, versions)
+
+    @staticmethod
+    async def search_users(db: DBSession, query: str, page: int = 1, page_size: int = 10, cursor: Optional[str] = None,
+                           mode: str = "fulltext", sort: str = "relevance", count: str = "exact",
+                           fields: Optional[List[str]] = None, as_rows: bool = False,
+                           backend_name: Optional[str] = None) -> dict:
+        return await _run(db, UserService.search_users, query, page, page_size, cursor, mode, sort, count, fields,
+                          as_rows, backend_name)
+
+    @staticmethod
+    async def get_changes(db: DBSession, cursor: Optional[str] = None, limit: int = 100,
+                          safety_lag_seconds: Optional[int] = None) -> dict:
+        return await _run(db, UserService.get_changes, cursor, limit, safety_lag_seconds)
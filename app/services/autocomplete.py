@@ -0,0 +1,185 @@
+"""
+In-process prefix index over user names for type-ahead.
+
+Each worker keeps a sorted list of "normalized name\\0name\\0id" strings
+and answers a prefix with a bisect and a short forward scan. The index is
+built from the database when the application starts (with
+AUTOCOMPLETE_ENABLED), updated by UserService as this worker creates,
+renames and deletes users, and caught up periodically from
+idx_updated_at_id for writes made by other workers.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import logging
+import threading
+import time
+import unicodedata
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Sorts before every character of a name, so "ann" < "ann smith" < "anna"
+SEPARATOR = "\x00"
+
+# Catch-up windows overlap by this much: updated_at has second precision
+# and a transaction may commit after the previous catch-up read
+SYNC_OVERLAP = timedelta(seconds=5)
+
+def normalize(name: str) -> str:
+    """Case-folded name without accents and with single spaces."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().replace(SEPARATOR, " ").split())
+
+class NameIndex:
+    """
+    Sorted array of names of non-deleted users, searched with bisect.
+
+    One string per user plus an id -> entry map for renames and deletes,
+    about 236 bytes per user in each worker (see
+    benchmarks/bench_autocomplete.py), hence opt-in. A
+    database with more than AUTOCOMPLETE_MAX_ENTRIES live users is not
+    indexed and search() keeps returning None.
+    """
+
+    def __init__(self):
+        self._entries: List[str] = []
+        self._by_id: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Changes made while a build is reading, replayed onto its result
+        self._pending: Optional[list] = None
+        self._synced_at: Optional[datetime] = None
+        self.ready = False
+        self.oversized = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(user_id: str, name: str) -> str:
+        return f"{normalize(name)}{SEPARATOR}{name}{SEPARATOR}{user_id}"
+
+    def search(self, prefix: str, limit: int) -> Optional[List[dict]]:
+        """First limit users whose normalized name starts with prefix, or None until built."""
+        if not self.ready:
+            return None
+        key = normalize(prefix)
+        if key and prefix[-1].isspace():
+            key += " "  # "ann " should not match "anna"
+        matches = []
+        with self._lock:
+            position = bisect_left(self._entries, key)
+            for entry in self._entries[position:position + limit]:
+                if not entry.startswith(key):
+                    break
+                matches.append(entry)
+        return [
+            {"id": user_id, "name": name}
+            for _, name, user_id in (entry.split(SEPARATOR) for entry in matches)
+        ]
+
+    def add(self, user_id: str, name: str) -> None:
+        """Index a created or restored user, or a new name for an indexed one."""
+        self._apply(user_id, name)
+
+    def remove(self, user_id: str) -> None:
+        self._apply(user_id, None)
+
+    def _apply(self, user_id: str, name: Optional[str]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((user_id, name))
+            elif self.ready:
+                self._apply_locked(user_id, name)
+
+    def _apply_locked(self, user_id: str, name: Optional[str]) -> None:
+        entry = self._entry(user_id, name) if name is not None else None
+        current = self._by_id.get(user_id)
+        if current == entry:
+            return
+        if current is not None:
+            del self._entries[bisect_left(self._entries, current)]
+            del self._by_id[user_id]
+        if entry is not None:
+            insort(self._entries, entry)
+            self._by_id[user_id] = entry
+
+    def build(self, db: Session, max_entries: int, batch_size: int = 10000) -> bool:
+        """
+        Load every live user's name; False (and no index) if there are more than max_entries.
+
+        Reads primary key ranges, one short transaction per batch, so no
+        connection or snapshot is held for the whole build. Deleted rows are
+        skipped here rather than in SQL, where an is_deleted index would
+        turn each range into a sort of the whole table.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            synced_at = db.scalar(select(func.now()))
+            entries: List[str] = []
+            by_id: Dict[str, str] = {}
+            last_id = None
+            while True:
+                query = select(User.id, User.name, User.is_deleted).order_by(User.id).limit(batch_size)
+                if last_id is not None:
+                    query = query.where(User.id > last_id)
+                rows = db.execute(query).all()
+                db.commit()
+                live = [(user_id, name) for user_id, name, is_deleted in rows if not is_deleted]
+                if len(entries) + len(live) > max_entries:
+                    self.oversized = True
+                    logger.warning("More than %s users; autocomplete falls back to the database", max_entries)
+                    return False
+                for user_id, name in live:
+                    entry = self._entry(user_id, name)
+                    entries.append(entry)
+                    by_id[user_id] = entry
+                if len(rows) < batch_size:
+                    break
+                last_id = rows[-1].id
+            entries.sort()
+
+            with self._lock:
+                self._entries, self._by_id = entries, by_id
+                for user_id, name in self._pending:
+                    self._apply_locked(user_id, name)
+                self._synced_at = synced_at
+                self.ready = True
+        finally:
+            with self._lock:
+                self._pending = None
+        logger.info("Autocomplete index built: %s names in %.0f ms", len(entries), (time.perf_counter() - started) * 1000)
+        return True
+
+    def sync(self, db: Session) -> int:
+        """Apply users changed since the previous build or sync, e.g. by other workers."""
+        synced_at = db.scalar(select(func.now()))
+        rows = db.execute(
+            select(User.id, User.name, User.is_deleted).where(User.updated_at >= self._synced_at - SYNC_OVERLAP)
+        ).all()
+        with self._lock:
+            for user_id, name, is_deleted in rows:
+                self._apply_locked(user_id, None if is_deleted else name)
+            self._synced_at = synced_at
+        logger.debug("Autocomplete index caught up on %s changed users", len(rows))
+        return len(rows)
+
+    def refresh(self, db: Session, max_entries: int) -> None:
+        """Build the index on first use, catch up afterwards; an oversized database is not retried."""
+        if self.ready:
+            self.sync(db)
+        elif not self.oversized:
+            self.build(db, max_entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries, self._by_id = [], {}
+            self._synced_at = None
+            self.ready = self.oversized = False
+
+name_index = NameIndex()
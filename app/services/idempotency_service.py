@@ -0,0 +1,85 @@
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from app.models.idempotency import IdempotencyKey
+from app.models.user import User
+from app.schemas.user import UserCreate
+from fastapi import HTTPException, status
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+import hashlib
+import json
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyService:
+
+    @staticmethod
+    def request_hash(user_data: UserCreate) -> str:
+        """Fingerprint a create request so a reused key with a different body can be rejected."""
+        payload = user_data.model_dump(mode='json', exclude={'idempotency_key'})
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def replay(db: Session, key: str, request_hash: str) -> Optional[User]:
+        """
+        Return the user created by an earlier request with this key, if any.
+
+        A single primary-key lookup joined to the user row; expired keys and
+        keys whose user has since been deleted are dropped so the caller
+        creates (or restores) the user again.
+        """
+        row = db.query(IdempotencyKey, User)\
+            .outerjoin(User, and_(User.id == IdempotencyKey.user_id, User.is_deleted == False))\
+            .filter(IdempotencyKey.key == key)\
+            .first()
+        if not row:
+            return None
+
+        record, user = row
+        if record.expires_at <= datetime.utcnow():
+            db.delete(record)
+            db.flush()
+            return None
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency key already used with a different request"
+            )
+        if user is None:
+            db.delete(record)
+            db.flush()
+            return None
+
+        logger.info("Duplicate request detected via idempotency key, returning existing user: %s", user.id)
+        return user
+
+    @staticmethod
+    def remember(db: Session, key: str, user_id: str, request_hash: str) -> None:
+        """Stage a key record in the caller's transaction."""
+        ttl = get_settings().IDEMPOTENCY_KEY_TTL_SECONDS
+        db.add(IdempotencyKey(
+            key=key,
+            user_id=user_id,
+            request_hash=request_hash,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        ))
+
+    @staticmethod
+    def purge_expired(db: Session, batch_size: int = 1000) -> int:
+        """Delete expired keys in small batches to keep lock times short."""
+        purged = 0
+        now = datetime.utcnow()
+        while True:
+            keys = [key for (key,) in db.query(IdempotencyKey.key)
+                    .filter(IdempotencyKey.expires_at <= now)
+                    .limit(batch_size)]
+            if not keys:
+                break
+            db.query(IdempotencyKey).filter(IdempotencyKey.key.in_(keys)).delete(synchronize_session=False)
+            db.commit()
+            purged += len(keys)
+        if purged:
+            logger.info("Purged %s expired idempotency keys", purged)
+        return purged
@@ -0,0 +1,102 @@
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional, Set
+from datetime import datetime, timedelta
+import logging
+import time
+from app.models.archive import ARCHIVED_COLUMNS, UserArchive
+from app.models.user import User
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+users = User.__table__
+archive = UserArchive.__table__
+
+class RetentionService:
+
+    @staticmethod
+    def _expired(cutoff: datetime):
+        return (users.c.is_deleted == True) & (users.c.deleted_at < cutoff)
+
+    @staticmethod
+    def count_archivable(db: Session, days: int) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        return db.execute(select(func.count()).select_from(users).where(RetentionService._expired(cutoff))).scalar()
+
+    @staticmethod
+    def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+        """
+        Move the oldest batch of expired soft-deleted users into users_archive.
+
+        Rows are picked in (deleted_at, id) order from idx_deleted_at and
+        locked with SKIP LOCKED, so concurrent runs split the work. Copy and
+        delete share one short transaction per batch.
+        """
+        ids = db.execute(
+            select(users.c.id)
+            .where(RetentionService._expired(cutoff))
+            .order_by(users.c.deleted_at, users.c.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return 0
+
+        db.execute(insert(archive).from_select(
+            ARCHIVED_COLUMNS,
+            select(*(users.c[name] for name in ARCHIVED_COLUMNS)).where(users.c.id.in_(ids))
+        ))
+        db.execute(delete(users).where(users.c.id.in_(ids)))
+        db.commit()
+        return len(ids)
+
+    @staticmethod
+    def archive_deleted_users(db: Session, days: Optional[int] = None, batch_size: Optional[int] = None,
+                              pause: Optional[float] = None, max_batches: Optional[int] = None) -> int:
+        """Archive users soft-deleted more than days ago, pausing between batches to throttle load."""
+        settings = get_settings()
+        days = settings.RETENTION_DAYS if days is None else days
+        batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        pause = settings.RETENTION_BATCH_PAUSE_SECONDS if pause is None else pause
+        cutoff = datetime.utcnow() - timedelta(days=days)
+
+        archived = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = RetentionService.archive_batch(db, cutoff, batch_size)
+            archived += moved
+            batches += 1
+            if moved < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        if archived:
+            logger.info("Archived %s users deleted before %s in %s batches", archived, cutoff, batches)
+        return archived
+
+    @staticmethod
+    def archived_emails(db: Session, emails: Iterable[str]) -> Set[str]:
+        """Which of emails belong to archived users."""
+        return set(db.execute(select(archive.c.email).where(archive.c.email.in_(set(emails)))).scalars())
+
+    @staticmethod
+    def restore_archived(db: Session, email: str) -> Optional[User]:
+        """
+        Move an archived user with this email back, staged in the caller's transaction.
+
+        Returns the pending, still soft-deleted User for create_user's
+        restore path, which overwrites its fields before the INSERT is flushed.
+        """
+        row = db.execute(
+            select(archive).where(archive.c.email == email).order_by(archive.c.archived_at.desc()).limit(1)
+        ).mappings().first()
+        if row is None:
+            return None
+
+        db.execute(delete(archive).where(archive.c.id == row["id"]))
+        user = User(**{name: row[name] for name in ARCHIVED_COLUMNS})
+        # An INSERT keeps the archived updated_at, which would hide the restore from the change feed
+        user.updated_at = func.now()
+        db.add(user)
+        return user
@@ -0,0 +1,95 @@
+from sqlalchemy import literal_column, or_, select, table, column, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Query
+from typing import List, Optional, Tuple
+from app.models.user import User
+from app.config import get_settings
+
+SearchResult = Tuple[Query, List]
+
+def _escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class SearchBackend:
+    """Applies a search term to a user query and supplies its relevance ordering."""
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        """Return the filtered query and ORDER BY clauses ranking the best matches first."""
+        raise NotImplementedError
+
+class LikeSearchBackend(SearchBackend):
+    """Substring match with LIKE '%term%'; portable but scans the table."""
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        pattern = f"%{_escape_like(term)}%"
+        return query.filter(or_(
+            User.name.like(pattern, escape='\\'),
+            User.email.like(pattern, escape='\\')
+        )), []
+
+class MySQLFullTextSearchBackend(SearchBackend):
+    """Phrase search on the ngram FULLTEXT index ft_users_name_email, ranked by MATCH score."""
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        phrase = '"' + term.replace('"', ' ') + '"'
+        relevance = match(User.name, User.email, against=phrase).in_boolean_mode()
+        return query.filter(relevance), [relevance.desc()]
+
+class SQLiteFTS5SearchBackend(SearchBackend):
+    """
+    Phrase search on the users_fts trigram table, ranked by bm25.
+
+    The matches are collected in a MATERIALIZED CTE first; as a plain join
+    the planner may drive from the users indexes and re-run MATCH per row.
+    """
+
+    fts = table('users_fts', column('rowid'), column('rank'))
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        if len(term) < 3:
+            # Trigram indexes cannot answer terms shorter than one trigram
+            return LikeSearchBackend().apply(query, term)
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = select(self.fts.c.rowid.label('match_rowid'), self.fts.c.rank)\
+            .where(text('users_fts MATCH :search_phrase').bindparams(search_phrase=phrase))\
+            .cte('fts_matches')\
+            .prefix_with('MATERIALIZED')
+        query = query.join(matches, matches.c.match_rowid == literal_column('users.rowid'))
+        return query, [matches.c.rank.asc()]
+
+class PrefixSearchBackend(SearchBackend):
+    """Names or emails starting with the term; a B-tree range scan on each index."""
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        pattern = f"{_escape_like(term)}%"
+        return query.filter(or_(
+            User.name.like(pattern, escape='\\'),
+            User.email.like(pattern, escape='\\')
+        )), []
+
+class EmailDomainSearchBackend(SearchBackend):
+    """Emails whose domain starts with the term, as a range scan on ix_users_email_domain."""
+
+    def apply(self, query: Query, term: str) -> SearchResult:
+        domain = term.lstrip('@').lower()
+        return query.filter(User.email_domain.like(f"{_escape_like(domain)}%", escape='\\')), []
+
+FULLTEXT_BACKENDS = {
+    'mysql_fulltext': MySQLFullTextSearchBackend,
+    'sqlite_fts5': SQLiteFTS5SearchBackend,
+    'like': LikeSearchBackend,
+}
+
+def get_search_backend(dialect_name: str, mode: str = 'fulltext', name: Optional[str] = None) -> SearchBackend:
+    """Pick the backend for a search mode; fulltext follows name (default SEARCH_BACKEND) or the database dialect."""
+    if mode == 'prefix':
+        return PrefixSearchBackend()
+    if mode == 'domain':
+        return EmailDomainSearchBackend()
+
+    name = name or get_settings().SEARCH_BACKEND
+    if name == 'auto':
+        name = {'mysql': 'mysql_fulltext', 'sqlite': 'sqlite_fts5'}.get(dialect_name, 'like')
+    if name not in FULLTEXT_BACKENDS:
+        raise ValueError(f"Unknown search backend: {name}")
+    return FULLTEXT_BACKENDS[name]()
@@ -1,34 +1,74 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import and_, func, or_, insert, select, update
 from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from fastapi import HTTPException, status
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import logging
-import hashlib
+import csv
+import io
+import json
 from app.config import get_settings
+from app.log import PIIHash
+from app.utils.pagination import Cursor
+from app.utils.ingest import ParsedRow
+from app.utils.ids import new_user_id, parse_user_id
+from app.services.idempotency_service import IdempotencyService
+from app.services.retention_service import RetentionService
+from app.cache.user_cache import user_cache
+from app.routing import recent_writes
+from app.cache.count_cache import count_cache
+from app.services.search import get_search_backend
+from app.services.autocomplete import name_index
 
 logger = logging.getLogger(__name__)
 
+UNIQUE_FIELDS: List[Tuple[str, str]] = [
+    ('email', "Email"),
+    ('primary_mobile', "Mobile number"),
+    ('aadhaar', "Aadhaar"),
+    ('pan', "PAN"),
+]
+
+# How SQLite, MySQL and PostgreSQL word a unique index violation
+UNIQUE_VIOLATIONS: Tuple[str, ...] = ("UNIQUE constraint failed", "Duplicate entry", "duplicate key value")
+
+USER_FIELDS: List[str] = list(UserResponse.model_fields)
+
+# Keys accepted by lookup_users: the primary key and the unique identifiers
+LOOKUP_KEYS: List[str] = ['id'] + [field for field, _ in UNIQUE_FIELDS]
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
 class UserService:
     
     @staticmethod
-    def _hash_pii(value: str) -> str:
-        """Create a non-reversible hash of PII for secure logging."""
-        settings = get_settings()
-        hash_input = f"{settings.LOG_HASH_SECRET}{value}".encode('utf-8')
-        return hashlib.sha256(hash_input).hexdigest()[:16]
+    def _hash_pii(value: str) -> PIIHash:
+        """Non-reversible hash of PII for secure logging, computed only if the record is written."""
+        return PIIHash(value, get_settings().LOG_HASH_SECRET)
+    
+    @staticmethod
+    def _integrity_error_detail(e: IntegrityError, state: str = "exists") -> str:
+        """Map a unique index violation to a client-facing message."""
+        error_msg = str(e.orig)
+        if not any(marker in error_msg for marker in UNIQUE_VIOLATIONS):
+            return "Invalid user data"
+        for field, name in UNIQUE_FIELDS:
+            if field in error_msg:
+                return f"{name} already {state}"
+        return "Duplicate entry found"
     
     @staticmethod
     def _check_unique_fields(db: Session, user_data: UserCreate, exclude_id: str = None) -> None:
         checks: List[Tuple[str, str, str]] = [
-            ('email', user_data.email, "Email"),
-            ('primary_mobile', user_data.primary_mobile, "Mobile number"),
-            ('aadhaar', user_data.aadhaar, "Aadhaar"),
-            ('pan', user_data.pan, "PAN"),
+            (field, getattr(user_data, field), name) for field, name in UNIQUE_FIELDS
         ]
         
         for field, value, name in checks:
@@ -48,31 +88,36 @@ class UserService:
     @staticmethod
     def create_user(db: Session, user_data: UserCreate) -> User:
         hashed_id = UserService._hash_pii(user_data.email)
-        logger.info(f"Creating user with identifier: {hashed_id}")
+        logger.info("Creating user with identifier: %s", hashed_id)
         
-        if user_data.idempotency_key:
-            existing = db.query(User).filter(
-                User.version == user_data.idempotency_key,
-                User.is_deleted == False
-            ).first()
+        idempotency_key = user_data.idempotency_key
+        if idempotency_key:
+            request_hash = IdempotencyService.request_hash(user_data)
+            existing = IdempotencyService.replay(db, idempotency_key, request_hash)
             if existing:
-                logger.info(f"Duplicate request detected via idempotency key, returning existing user: {existing.id}")
                 return existing
         
         existing_email = db.query(User).filter(User.email == user_data.email).first()
+        if existing_email is None:
+            existing_email = RetentionService.restore_archived(db, user_data.email)
         if existing_email and existing_email.is_deleted:
-            logger.info(f"Restoring soft-deleted user with identifier: {hashed_id}")
+            logger.info("Restoring soft-deleted user with identifier: %s", hashed_id)
             UserService._check_unique_fields(db, user_data, exclude_id=existing_email.id)
-            for field, value in user_data.model_dump().items():
+            for field, value in user_data.model_dump(exclude={'idempotency_key'}).items():
                 setattr(existing_email, field, value)
             existing_email.is_deleted = False
             existing_email.deleted_at = None
             existing_email.deleted_by = None
             existing_email.is_active = True
             existing_email.version = str(uuid.uuid4())
+            if idempotency_key:
+                IdempotencyService.remember(db, idempotency_key, existing_email.id, request_hash)
             db.commit()
+            user_cache.invalidate(existing_email.id)
+            recent_writes.record(existing_email.id, existing_email.version)
             db.refresh(existing_email)
-            logger.info(f"User restored successfully: {existing_email.id}")
+            name_index.add(existing_email.id, existing_email.name)
+            logger.info("User restored successfully: %s", existing_email.id)
             return existing_email
         
         UserService._check_unique_fields(db, user_data)
@@ -82,124 +127,623 @@ class UserService:
             user_dict = user_data.model_dump(exclude={'idempotency_key'})
             db_user = User(**user_dict)
             db.add(db_user)
+            if idempotency_key:
+                db.flush()
+                IdempotencyService.remember(db, idempotency_key, db_user.id, request_hash)
             db.commit()
             db.refresh(db_user)
-            logger.info(f"User created successfully: {db_user.id}")
+            recent_writes.record(db_user.id, db_user.version)
+            name_index.add(db_user.id, db_user.name)
+            logger.info("User created successfully: %s", db_user.id)
             return db_user
         except IntegrityError as e:
             db.rollback()
-            logger.error(f"Failed to create user with identifier {hashed_id}: {str(e)}")
-            error_msg = str(e.orig)
-            if 'email' in error_msg:
-                detail = "Email already exists"
-            elif 'primary_mobile' in error_msg:
-                detail = "Mobile number already exists"
-            elif 'aadhaar' in error_msg:
-                detail = "Aadhaar already exists"
-            elif 'pan' in error_msg:
-                detail = "PAN already exists"
+            if idempotency_key:
+                # A concurrent request with the same key may have won the race
+                existing = IdempotencyService.replay(db, idempotency_key, request_hash)
+                if existing:
+                    return existing
+            logger.error("Failed to create user with identifier %s: %s", hashed_id, e)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=UserService._integrity_error_detail(e))
+    
+    @staticmethod
+    def _insert_chunk(db: Session, chunk: List[Tuple[int, UserCreate]], seen: dict, results: list) -> None:
+        """
+        Insert one chunk of validated rows.
+
+        Conflicts with stored users are resolved with a single set-based query
+        over the unique columns (deleted rows included, since the unique
+        indexes cover them too), then the survivors go out as one multi-row
+        INSERT and one commit. Rows whose email belongs to a soft-deleted or
+        archived user restore that user through create_user, as POST
+        /users/ does.
+        """
+        conditions = [
+            getattr(User, field).in_({getattr(user, field) for _, user in chunk})
+            for field, _ in UNIQUE_FIELDS
+        ]
+        taken = {field: set() for field, _ in UNIQUE_FIELDS}
+        deleted_emails = set()
+        for existing in db.query(User.email, User.primary_mobile, User.aadhaar, User.pan, User.is_deleted)\
+                .filter(or_(*conditions)):
+            for field, _ in UNIQUE_FIELDS:
+                taken[field].add(getattr(existing, field))
+            if existing.is_deleted:
+                deleted_emails.add(existing.email)
+        deleted_emails |= RetentionService.archived_emails(db, (user.email for _, user in chunk))
+        
+        pending = []
+        restores = []
+        for row_number, user in chunk:
+            error = None
+            restore = user.email in deleted_emails
+            for field, name in UNIQUE_FIELDS:
+                value = getattr(user, field)
+                if value in taken[field] and not restore:
+                    error = f"{name} already registered"
+                elif value in seen[field]:
+                    error = f"Duplicate {name} in upload"
+                if error:
+                    break
+            if error:
+                results.append({"row": row_number, "status": "failed", "error": error})
+                continue
+            for field, _ in UNIQUE_FIELDS:
+                seen[field].add(getattr(user, field))
+            if restore:
+                restores.append((row_number, user))
+                continue
+            user_dict = user.model_dump(exclude={'idempotency_key'})
+            user_dict['id'] = new_user_id()
+            user_dict['email_domain'] = User.domain_of(user_dict['email'])
+            user_dict['version'] = str(uuid.uuid4())
+            pending.append((row_number, user_dict))
+        
+        for row_number, user in restores:
+            try:
+                restored = UserService.create_user(db, user)
+            except HTTPException as e:
+                # Drop anything create_user staged, such as an archive row it took out
+                db.rollback()
+                results.append({"row": row_number, "status": "failed", "error": e.detail})
             else:
-                detail = "Duplicate entry found"
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+                results.append({"row": row_number, "status": "created", "id": restored.id})
+        
+        if not pending:
+            return
+        
+        try:
+            db.execute(insert(User), [user_dict for _, user_dict in pending])
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent writer; retry row by row so only
+            # the offending rows are rejected.
+            db.rollback()
+            for row_number, user_dict in pending:
+                try:
+                    db.execute(insert(User), [user_dict])
+                    db.commit()
+                except IntegrityError as e:
+                    db.rollback()
+                    results.append({"row": row_number, "status": "failed", "error": UserService._integrity_error_detail(e)})
+                else:
+                    results.append({"row": row_number, "status": "created", "id": user_dict['id']})
+                    name_index.add(user_dict['id'], user_dict['name'])
+            return
+        
+        for row_number, user_dict in pending:
+            results.append({"row": row_number, "status": "created", "id": user_dict['id']})
+            name_index.add(user_dict['id'], user_dict['name'])
+    
+    @staticmethod
+    def bulk_create_users(db: Session, rows: Iterable[ParsedRow], chunk_size: int = None) -> dict:
+        """
+        Validate and insert a stream of parsed rows in chunks.
+
+        Rows are numbered from 1 in input order; every row gets a result
+        entry, so a bad row never fails the rest of the upload.
+        """
+        chunk_size = chunk_size or get_settings().BULK_CHUNK_SIZE
+        results = []
+        seen = {field: set() for field, _ in UNIQUE_FIELDS}
+        chunk: List[Tuple[int, UserCreate]] = []
+        row_number = 0
+        
+        for row_number, (data, error) in enumerate(rows, start=1):
+            if error:
+                results.append({"row": row_number, "status": "failed", "error": error})
+                continue
+            try:
+                chunk.append((row_number, UserCreate.model_validate(data)))
+            except ValidationError as e:
+                detail = "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+                results.append({"row": row_number, "status": "failed", "error": detail})
+                continue
+            if len(chunk) >= chunk_size:
+                UserService._insert_chunk(db, chunk, seen, results)
+                chunk = []
+        
+        if chunk:
+            UserService._insert_chunk(db, chunk, seen, results)
+        
+        results.sort(key=lambda result: result["row"])
+        created = sum(1 for result in results if result["status"] == "created")
+        logger.info("Bulk import processed %s rows: %s created, %s failed", row_number, created, row_number - created)
+        return {
+            "total": row_number,
+            "created": created,
+            "failed": row_number - created,
+            "results": results
+        }
+    
+    @staticmethod
+    def _require_user_id(user_id: str) -> str:
+        """
+        Canonical form of user_id, the key for the cache, recent writes and name index.
+
+        BinaryUUID binds any UUID spelling, so uppercase or braced ids reach
+        the same row and must share its cache entries. 404 for ids that are
+        not UUIDs, which BinaryUUID refuses to bind.
+        """
+        canonical = parse_user_id(user_id)
+        if canonical is None:
+            logger.warning("User not found: %s", user_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        return canonical
     
     @staticmethod
     def get_user_by_id(db: Session, user_id: str) -> User:
-        logger.debug(f"Fetching user: {user_id}")
+        logger.debug("Fetching user: %s", user_id)
+        user_id = UserService._require_user_id(user_id)
         user = db.query(User).filter(and_(User.id == user_id, User.is_deleted == False)).first()
         if not user:
-            logger.warning(f"User not found: {user_id}")
+            logger.warning("User not found: %s", user_id)
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         return user
     
     @staticmethod
-    def update_user(db: Session, user_id: str, user_data: UserUpdate) -> User:
-        logger.info(f"Updating user: {user_id}")
-        db_user = UserService.get_user_by_id(db, user_id)
-        update_data = user_data.model_dump(exclude_unset=True)
+    def get_user_cached(db: Session, user_id: str) -> dict:
+        """
+        Serialized user for read endpoints, served from the entity cache.
+
+        The returned dict carries the row version for ETags. Unknown ids are
+        cached briefly as misses so repeated lookups skip the database too.
+        """
+        user_id = UserService._require_user_id(user_id)
+        hit, cached = user_cache.get(user_id)
+        if hit:
+            if cached is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            return cached
         
-        if not update_data:
-            logger.debug(f"No updates provided for user: {user_id}")
-            return db_user
+        logger.debug("Cache miss, fetching user: %s", user_id)
+        if recent_writes.version(user_id) is not None:
+            # A replica may not have this worker's write yet
+            db.info['use_primary'] = True
+        user = db.query(User).filter(and_(User.id == user_id, User.is_deleted == False)).first()
+        if not user:
+            logger.warning("User not found: %s", user_id)
+            user_cache.put_missing(user_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         
-        temp_user = UserCreate(
-            name=update_data.get('name', db_user.name),
-            email=update_data.get('email', db_user.email),
-            primary_mobile=update_data.get('primary_mobile', db_user.primary_mobile),
-            secondary_mobile=update_data.get('secondary_mobile', db_user.secondary_mobile),
-            aadhaar=db_user.aadhaar,
-            pan=db_user.pan,
-            date_of_birth=db_user.date_of_birth,
-            place_of_birth=db_user.place_of_birth,
-            current_address=update_data.get('current_address', db_user.current_address),
-            permanent_address=update_data.get('permanent_address', db_user.permanent_address)
-        )
-        UserService._check_unique_fields(db, temp_user, exclude_id=user_id)
+        data = UserService._serialize(user)
+        user_cache.put(user_id, data)
+        return data
+    
+    @staticmethod
+    def _serialize(user: User) -> dict:
+        """The entity cache's form of a user: the response fields plus its version."""
+        data = UserResponse.model_validate(user).model_dump(mode='json')
+        data["version"] = user.version
+        return data
+    
+    @staticmethod
+    def _lookup_value(key: str, value: str) -> str:
+        """value in the form UserCreate stores it."""
+        value = value.strip()
+        if key == 'id':
+            return parse_user_id(value) or value
+        if key == 'email':
+            local, _, domain = value.rpartition('@')
+            return f"{local}@{domain.lower()}" if local else value
+        if key == 'pan':
+            return value.upper()
+        return value
+    
+    @staticmethod
+    def lookup_users(db: Session, values: Dict[str, List[str]], max_values: Optional[int] = None) -> dict:
+        """
+        Resolve ids and exact identifier values in one query per key.
+
+        Each key's values go into a single IN (...) on its unique index; ids
+        already in the entity cache are not queried, and the others are
+        cached. Results follow the order of each key's values, duplicates
+        included; unknown and deleted users are returned with found=False.
+        """
+        max_values = max_values or get_settings().LOOKUP_MAX_VALUES
+        if sum(len(requested) for requested in values.values()) > max_values:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {max_values} values per lookup"
+            )
+        
+        result = {"found": 0, "missed": 0}
+        for key in LOOKUP_KEYS:
+            requested = values.get(key) or []
+            keys = [UserService._lookup_value(key, value) for value in requested]
+            # MySQL compares emails case-insensitively, so match results the same way
+            match_key = str.lower if key == 'email' else str
+            users: Dict[str, dict] = {}
+            pending = list(dict.fromkeys(keys))
+            if key == 'id':
+                # Malformed ids cannot match and are reported as misses
+                pending = [user_id for user_id in pending if parse_user_id(user_id)]
+                cached = {user_id: user_cache.get(user_id) for user_id in pending}
+                users.update({user_id: data for user_id, (hit, data) in cached.items() if hit and data is not None})
+                pending = [user_id for user_id, (hit, _) in cached.items() if not hit]
+                if any(recent_writes.version(user_id) is not None for user_id in pending):
+                    # A replica may not have this worker's write yet
+                    db.info['use_primary'] = True
+            
+            if pending:
+                column = getattr(User, key)
+                matches = db.query(User).filter(column.in_(pending), User.is_deleted == False).all()
+                for user in matches:
+                    data = UserService._serialize(user)
+                    users[match_key(getattr(user, key))] = data
+                    if key == 'id':
+                        user_cache.put(user.id, data)
+                if key == 'id':
+                    for user_id in pending:
+                        if user_id not in users:
+                            user_cache.put_missing(user_id)
+            
+            result[key] = []
+            for value, lookup_value in zip(requested, keys):
+                data = users.get(match_key(lookup_value))
+                result[key].append({
+                    "value": value,
+                    "found": data is not None,
+                    "user": {name: data[name] for name in USER_FIELDS} if data is not None else None,
+                })
+            found = sum(1 for entry in result[key] if entry["found"])
+            result["found"] += found
+            result["missed"] += len(keys) - found
+        
+        logger.info("Looked up %s values (%s found)", result["found"] + result["missed"], result["found"])
+        return result
+    
+    @staticmethod
+    def _conditional_update(db: Session, user_id: str, values: dict, versions: Optional[List[str]] = None) -> User:
+        """
+        Apply values to a live user in one UPDATE ... WHERE id = ? AND version IN (?).
+
+        The row comes back through RETURNING where the dialect has it, or a
+        SELECT in the same transaction otherwise, and is detached before the
+        commit so no refresh query follows. Uniqueness is left to the unique
+        indexes. A missed row costs one more SELECT to tell 404 from 412.
+        """
+        user_id = UserService._require_user_id(user_id)
+        values = {**values, 'version': str(uuid.uuid4())}
+        if 'email' in values:
+            values['email_domain'] = User.domain_of(values['email'])
+        stmt = update(User).where(User.id == user_id, User.is_deleted == False).values(**values)
+        if versions is not None:
+            stmt = stmt.where(User.version.in_(versions))
+        options = {'synchronize_session': False}
+        
+        try:
+            if db.get_bind().dialect.update_returning:
+                db_user = db.scalars(stmt.returning(User), execution_options=options).one_or_none()
+            else:
+                result = db.execute(stmt, execution_options=options)
+                db_user = db.get(User, user_id, populate_existing=True) if result.rowcount else None
+        except IntegrityError as e:
+            db.rollback()
+            logger.warning("Update of user %s violates a constraint: %s", user_id, e.orig)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=UserService._integrity_error_detail(e, "registered"))
         
-        for field, value in update_data.items():
-            setattr(db_user, field, value)
+        if db_user is None:
+            current = db.query(User.version).filter(User.id == user_id, User.is_deleted == False).scalar()
+            db.rollback()
+            if current is None:
+                logger.warning("User not found: %s", user_id)
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            logger.info("Version mismatch updating user: %s", user_id)
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="User has been modified; fetch the current version and retry"
+            )
         
-        db_user.version = str(uuid.uuid4())
+        db.expunge(db_user)
         db.commit()
-        db.refresh(db_user)
-        logger.info(f"User updated successfully: {user_id}")
+        user_cache.invalidate(user_id)
+        recent_writes.record(user_id, db_user.version)
+        if values.get('is_deleted'):
+            name_index.remove(user_id)
+        elif 'name' in values:
+            name_index.add(user_id, db_user.name)
         return db_user
     
     @staticmethod
-    def get_all_users(db: Session, page: int = 1, page_size: int = 10):
-        logger.debug(f"Fetching users - page: {page}, page_size: {page_size}")
-        offset = (page - 1) * page_size
-        total = db.query(User).filter(User.is_deleted == False).count()
-        users = db.query(User).filter(User.is_deleted == False)\
-            .order_by(User.created_at.desc())\
-            .offset(offset)\
-            .limit(page_size)\
-            .all()
-        total_pages = (total + page_size - 1) // page_size
-        logger.info(f"Fetched {len(users)} users (total: {total})")
+    def update_user(db: Session, user_id: str, user_data: UserUpdate, versions: Optional[List[str]] = None) -> User:
+        """Update a user, optionally only if its version is one of versions (If-Match) or user_data.version."""
+        logger.info("Updating user: %s", user_id)
+        update_data = user_data.model_dump(exclude_unset=True, exclude={'version'})
+        if versions is None and user_data.version:
+            versions = [user_data.version]
+        
+        if not update_data:
+            logger.debug("No updates provided for user: %s", user_id)
+            db_user = UserService.get_user_by_id(db, user_id)
+            if versions is not None and db_user.version not in versions:
+                raise HTTPException(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="User has been modified; fetch the current version and retry"
+                )
+            return db_user
+        
+        db_user = UserService._conditional_update(db, user_id, update_data, versions)
+        logger.info("User updated successfully: %s", user_id)
+        return db_user
+    
+    @staticmethod
+    def _project(query, fields: Optional[List[str]], as_rows: bool = False):
+        """
+        Narrow a user query to the requested columns, plus the id and created_at that paging needs.
+
+        Entities get only those attributes loaded. With as_rows the query
+        yields plain Row tuples instead, skipping entity construction and
+        identity-map bookkeeping for the pre-encoded JSON read path.
+        """
+        if as_rows:
+            columns = dict.fromkeys(['id', 'created_at', *(fields or USER_FIELDS)])
+            return query.with_entities(*(getattr(User, name) for name in columns))
+        if not fields:
+            return query
+        columns = dict.fromkeys(['id', 'created_at', *fields])
+        return query.options(load_only(*(getattr(User, name) for name in columns)))
+    
+    @staticmethod
+    def _paginate(query, page: int, page_size: int, cursor: Optional[str] = None, ranking: Optional[list] = None,
+                  count: str = "exact", count_key: Optional[str] = None) -> dict:
+        """
+        Page a query in (created_at DESC, id DESC) order.
+
+        With a cursor the page is a keyset seek on idx_is_deleted_created_at
+        (InnoDB secondary indexes carry the primary key, so the id tie-break
+        is covered too); without one the classic OFFSET paging is used.
+        Relevance-ranked queries pass their ORDER BY clauses as ranking;
+        those only support OFFSET paging.
+
+        count selects how the total is produced: exact runs COUNT(*),
+        estimated serves a background-refreshed cached count for count_key,
+        and none skips it, leaving has_more as the only paging signal.
+        """
+        if ranking and cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor paging requires sort=recent"
+            )
+        if count == "exact":
+            total = query.count()
+        elif count == "estimated":
+            total = count_cache.get(count_key, query)
+        else:
+            total = None
+        ordered = query.order_by(*(ranking or []), User.created_at.desc(), User.id.desc())
+        
+        if cursor:
+            try:
+                created_at, last_id = Cursor.decode(cursor)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            ordered = ordered.filter(or_(
+                User.created_at < created_at,
+                and_(User.created_at == created_at, User.id < last_id)
+            ))
+        else:
+            ordered = ordered.offset((page - 1) * page_size)
+        
+        # Fetch one extra row to learn whether another page exists
+        users = ordered.limit(page_size + 1).all()
+        next_cursor = None
+        has_more = len(users) > page_size
+        if has_more:
+            users = users[:page_size]
+            if not ranking:
+                next_cursor = Cursor.encode(users[-1].created_at, users[-1].id)
         
         return {
             "total": total,
             "page": page,
             "page_size": page_size,
-            "total_pages": total_pages,
+            "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+            "count_mode": count,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
             "data": users
         }
     
     @staticmethod
-    def soft_delete_user(db: Session, user_id: str) -> User:
-        logger.info(f"Soft deleting user: {user_id}")
-        db_user = UserService.get_user_by_id(db, user_id)
-        db_user.is_deleted = True
-        db_user.deleted_at = datetime.utcnow()
-        db_user.is_active = False
-        db.commit()
-        db.refresh(db_user)
-        logger.info(f"User soft deleted successfully: {user_id}")
+    def get_all_users(db: Session, page: int = 1, page_size: int = 10, cursor: Optional[str] = None,
+                      count: str = "exact", fields: Optional[List[str]] = None, as_rows: bool = False):
+        logger.debug("Fetching users - page: %s, page_size: %s, cursor: %s", page, page_size, cursor)
+        query = UserService._project(db.query(User).filter(User.is_deleted == False), fields, as_rows)
+        result = UserService._paginate(
+            query, page, page_size, cursor,
+            count=count, count_key="users"
+        )
+        logger.info("Fetched %s users (total: %s, count: %s)", len(result['data']), result['total'], count)
+        return result
+    
+    @staticmethod
+    def soft_delete_user(db: Session, user_id: str, versions: Optional[List[str]] = None) -> User:
+        logger.info("Soft deleting user: %s", user_id)
+        db_user = UserService._conditional_update(db, user_id, {
+            'is_deleted': True,
+            'deleted_at': datetime.utcnow(),
+            'is_active': False,
+        }, versions)
+        logger.info("User soft deleted successfully: %s", user_id)
         return db_user
     
     @staticmethod
-    def search_users(db: Session, query: str, page: int = 1, page_size: int = 10):
-        logger.debug(f"Searching users with query: {query}")
-        search_pattern = f"%{query}%"
-        base_query = db.query(User).filter(
-            User.is_deleted == False,
-            (User.name.like(search_pattern) | User.email.like(search_pattern))
+    def search_users(db: Session, query: str, page: int = 1, page_size: int = 10, cursor: Optional[str] = None,
+                     mode: str = "fulltext", sort: str = "relevance", count: str = "exact",
+                     fields: Optional[List[str]] = None, as_rows: bool = False, backend_name: Optional[str] = None):
+        logger.debug("Searching users with query: %s (mode: %s, sort: %s)", query, mode, sort)
+        backend = get_search_backend(db.get_bind().dialect.name, mode, backend_name)
+        base_query = UserService._project(db.query(User).filter(User.is_deleted == False), fields, as_rows)
+        base_query, ranking = backend.apply(base_query, query)
+        
+        result = UserService._paginate(
+            base_query, page, page_size, cursor, ranking if sort == "relevance" else None,
+            count=count, count_key=f"search:{mode}:{query}"
         )
+        logger.info("Search found %s users matching query (count: %s)", result['total'], count)
+        return result
+    
+    @staticmethod
+    def autocomplete_users(db: Session, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Users whose name starts with prefix, in name order.
+
+        Served from the in-process name index; until it is built (or when
+        the database is too large for it) a range scan on ix_users_name.
+        """
+        matches = name_index.search(prefix, limit)
+        if matches is not None:
+            return matches
+        rows = db.query(User.id, User.name)\
+            .filter(User.is_deleted == False, User.name.startswith(prefix.lstrip(), autoescape=True))\
+            .order_by(User.name)\
+            .limit(limit)
+        return [{"id": user_id, "name": name} for user_id, name in rows]
+    
+    @staticmethod
+    def _select_fields(fields: Optional[str], allowed: List[str]) -> List[str]:
+        """Parse a comma-separated field list, defaulting to every allowed field."""
+        if not fields:
+            return list(allowed)
+        selected = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in selected if field not in allowed]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields selected"
+            )
+        return list(dict.fromkeys(selected))
+    
+    @staticmethod
+    def export_users(db: Session, fields: List[str], format: str = "ndjson",
+                     created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                     updated_from: Optional[datetime] = None, updated_to: Optional[datetime] = None,
+                     batch_size: Optional[int] = None) -> Iterator[str]:
+        """
+        Stream every non-deleted user as NDJSON or CSV text chunks.
+
+        Runs on its own session because the response body is produced after
+        the request's session has been closed. Rows are read as plain tuples
+        through a server-side cursor (yield_per) and encoded one batch at a
+        time, so memory stays flat regardless of table size.
+        """
+        bind = db.get_bind()
+        batch_size = batch_size or get_settings().EXPORT_BATCH_SIZE
+        statement = select(*(getattr(User, field) for field in fields)).where(User.is_deleted == False)
+        if created_from:
+            statement = statement.where(User.created_at >= created_from)
+        if created_to:
+            statement = statement.where(User.created_at < created_to)
+        if updated_from:
+            statement = statement.where(User.updated_at >= updated_from)
+        if updated_to:
+            statement = statement.where(User.updated_at < updated_to)
+        statement = statement.execution_options(yield_per=batch_size)
         
-        offset = (page - 1) * page_size
-        total = base_query.count()
-        users = base_query.order_by(User.created_at.desc())\
-            .offset(offset)\
-            .limit(page_size)\
-            .all()
+        def generate() -> Iterator[str]:
+            exported = 0
+            logger.info("Starting user export (format: %s, fields: %s)", format, len(fields))
+            with Session(bind=bind) as session:
+                result = session.execute(statement)
+                if format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    writer.writerow(fields)
+                    for batch in result.partitions():
+                        writer.writerows(
+                            [value.isoformat() if isinstance(value, (date, datetime)) else value for value in row]
+                            for row in batch
+                        )
+                        exported += len(batch)
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                    if not exported:
+                        yield buffer.getvalue()
+                else:
+                    for batch in result.partitions():
+                        exported += len(batch)
+                        yield "".join(
+                            json.dumps(dict(zip(fields, row)), default=_json_default) + "\n" for row in batch
+                        )
+            logger.info("Exported %s users", exported)
         
-        total_pages = (total + page_size - 1) // page_size
-        logger.info(f"Search found {total} users matching query")
+        return generate()
+    
+    @staticmethod
+    def get_changes(db: Session, cursor: Optional[str] = None, limit: int = 100,
+                    safety_lag_seconds: Optional[int] = None) -> dict:
+        """
+        Users created, updated or soft-deleted after cursor, oldest change first.
+
+        A keyset seek on idx_updated_at_id in (updated_at, id) order. Rows
+        changed in the last CHANGES_SAFETY_LAG_SECONDS are held back: with
+        second-precision timestamps, a transaction committing late could
+        otherwise land behind a cursor that was already handed out. A user
+        appears once per batch in its latest state; soft-deleted users are
+        tombstones without their data. next_cursor is always set, so an
+        empty batch can be polled again with the same token.
+        """
+        try:
+            since = Cursor.decode(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
         
+        # Replicas may lag behind the cutoff, and skipped rows would never be read again
+        db.info['use_primary'] = True
+        if safety_lag_seconds is None:
+            safety_lag_seconds = get_settings().CHANGES_SAFETY_LAG_SECONDS
+        cutoff = db.scalar(select(func.now())) - timedelta(seconds=safety_lag_seconds)
+        columns = dict.fromkeys(['id', 'updated_at', 'created_at', 'is_deleted', 'deleted_at', *USER_FIELDS])
+        query = db.query(*(getattr(User, name) for name in columns)).filter(User.updated_at < cutoff)
+        if since:
+            updated_at, last_id = since
+            # One range on updated_at with the tie-break as a filter; an OR
+            # of two ranges makes planners sort everything after the cursor
+            query = query.filter(
+                User.updated_at >= updated_at,
+                or_(User.updated_at > updated_at, User.id > last_id)
+            )
+        rows = query.order_by(User.updated_at, User.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        changes = []
+        for row in rows:
+            if row.is_deleted:
+                changes.append({"change": "deleted", "id": row.id, "updated_at": row.updated_at,
+                                "deleted_at": row.deleted_at, "user": None})
+            else:
+                changes.append({"change": "created" if row.created_at == row.updated_at else "updated",
+                                "id": row.id, "updated_at": row.updated_at, "deleted_at": None,
+                                "user": {name: getattr(row, name) for name in USER_FIELDS}})
+        
+        logger.info("Change feed returned %s changes (has_more: %s)", len(changes), has_more)
         return {
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
-            "data": users
-        }
\ No newline at end of file
+            "data": changes,
+            "has_more": has_more,
+            "next_cursor": Cursor.encode(rows[-1].updated_at, rows[-1].id) if rows else cursor,
+        }
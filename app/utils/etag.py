@@ -0,0 +1,31 @@
+from typing import List, Optional
+
+class ETag:
+    """Helpers for version-based entity tags"""
+
+    @staticmethod
+    def from_version(version: str) -> str:
+        """Build a strong ETag from a row version"""
+        return f'"{version}"'
+
+    @staticmethod
+    def matches(header: Optional[str], etag: str) -> bool:
+        """Check an If-None-Match / If-Match header value against an ETag"""
+        if not header:
+            return False
+        for candidate in header.split(','):
+            candidate = candidate.strip()
+            if candidate == '*' or candidate.removeprefix('W/') == etag:
+                return True
+        return False
+
+    @staticmethod
+    def versions(header: Optional[str]) -> Optional[List[str]]:
+        """Row versions listed in an If-Match header; None when absent or '*'"""
+        if not header or header.strip() == '*':
+            return None
+        # If-Match uses strong comparison, so weak tags never match
+        return [
+            candidate.strip()[1:-1] for candidate in header.split(',')
+            if candidate.strip().startswith('"') and candidate.strip().endswith('"')
+        ]
@@ -0,0 +1,26 @@
+from datetime import date, datetime
+from fastapi.responses import Response
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def dumps(value) -> bytes:
+    """Encode plain Python data to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(',', ':')).encode('utf-8')
+
+class RawJSONResponse(Response):
+    """Response for content already encoded by dumps()."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
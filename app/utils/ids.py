@@ -0,0 +1,32 @@
+import os
+import time
+import uuid
+from typing import Optional
+from app.config import get_settings
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7).
+
+    The first 48 bits are the Unix time in milliseconds, so ids created
+    later sort later and new rows append to the right edge of the primary
+    key instead of splitting random pages.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & ((1 << 48) - 1)) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+def parse_user_id(value: str) -> Optional[str]:
+    """Canonical form of a user id, or None if value is not a UUID."""
+    try:
+        return str(uuid.UUID(value))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def new_user_id() -> str:
+    """New user id in canonical string form, using the configured USER_ID_SCHEME."""
+    if get_settings().USER_ID_SCHEME == "uuid4":
+        return str(uuid.uuid4())
+    return str(uuid7())
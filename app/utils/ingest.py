@@ -0,0 +1,76 @@
+import codecs
+import csv
+import json
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import anyio
+
+ParsedRow = Tuple[Optional[dict], Optional[str]]
+
+def iter_request_body(request) -> Iterator[bytes]:
+    """
+    Iterate an ASGI request body from a worker thread.
+
+    Lets synchronous service code consume an upload chunk by chunk instead of
+    buffering the whole body in memory first.
+    """
+    stream = request.stream()
+
+    async def next_chunk():
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    while True:
+        chunk = anyio.from_thread.run(next_chunk)
+        if chunk is None:
+            return
+        if chunk:
+            yield chunk
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Split a stream of UTF-8 byte chunks into lines, keeping line endings.
+
+    Only the new chunk is split; the pieces of a line spanning several
+    chunks are collected and joined once its newline arrives, so a long
+    line costs linear time rather than a re-split per chunk.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    partial: List[str] = []
+    for chunk in chunks:
+        *lines, rest = decoder.decode(chunk).split('\n')
+        if lines:
+            partial.append(lines[0])
+            lines[0] = ''.join(partial)
+            partial = []
+            for line in lines:
+                yield line + '\n'
+        if rest:
+            partial.append(rest)
+    partial.append(decoder.decode(b'', final=True))
+    tail = ''.join(partial)
+    if tail:
+        yield tail
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[ParsedRow]:
+    """Parse newline-delimited JSON into (row, error) pairs, skipping blank lines"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield None, "Row must be a JSON object"
+            continue
+        yield row, None
+
+def parse_csv(lines: Iterable[str]) -> Iterator[ParsedRow]:
+    """Parse CSV with a header row into (row, error) pairs; empty cells become missing fields"""
+    for row in csv.DictReader(lines):
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}, None
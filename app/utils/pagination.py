@@ -0,0 +1,24 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Tuple
+
+class Cursor:
+    """Opaque keyset cursor over a (timestamp, id) order: (created_at, id) listings, (updated_at, id) changes."""
+
+    @staticmethod
+    def encode(timestamp: datetime, user_id: str) -> str:
+        """Encode the sort key of the last row on a page"""
+        payload = json.dumps([timestamp.isoformat(), user_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode(cursor: str) -> Tuple[datetime, str]:
+        """Decode a cursor back into its (timestamp, id) sort key"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, user_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            return datetime.fromisoformat(timestamp), str(uuid.UUID(user_id))
+        except (ValueError, TypeError, AttributeError, UnicodeError):
+            raise ValueError("Invalid cursor")
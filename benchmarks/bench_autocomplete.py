@@ -0,0 +1,98 @@
+"""
+Name autocomplete from the in-process index vs the database.
+
+Builds the name index from DATABASE_URL (seed it first with
+benchmarks.seed), reports build time and memory per user, then times the
+same random name prefixes through the index, through the database
+fallback (range scan on ix_users_name) and through GET /users/search/'s
+service call, which the front end used for type-ahead. Reports JSON.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --rows 1000000
+    AUTOCOMPLETE_MAX_ENTRIES=2000000 DATABASE_URL=sqlite:///bench.db python -m benchmarks.bench_autocomplete --queries 2000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from benchmarks.run import percentile
+
+def latencies(call, arguments: list) -> dict:
+    timings = []
+    for argument in arguments:
+        started = time.perf_counter()
+        call(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "queries": len(timings),
+        "p50_ms": round(percentile(timings, 50), 4),
+        "p99_ms": round(percentile(timings, 99), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=1000, help="Prefixes per method")
+    parser.add_argument("--database-queries", type=int, default=100, help="Prefixes for the database methods")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.config import get_settings
+    from app.database import get_database
+    from app.services.autocomplete import NameIndex, name_index
+    from app.services.user_service import UserService
+
+    max_entries = get_settings().AUTOCOMPLETE_MAX_ENTRIES
+    db = get_database().SessionLocal()
+    try:
+        started = time.perf_counter()
+        if not name_index.build(db, max_entries):
+            raise SystemExit(f"More than AUTOCOMPLETE_MAX_ENTRIES={max_entries} users")
+        build_seconds = time.perf_counter() - started
+        users = len(name_index)
+        if not users:
+            raise SystemExit("No users found; seed the database first (python -m benchmarks.seed)")
+
+        # Memory retained by a second, traced build
+        tracemalloc.start()
+        traced = NameIndex()
+        traced.build(db, max_entries)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+
+        rng = random.Random(args.seed)
+        names = [match["name"] for match in name_index.search("", users)]
+        prefixes = [name[:rng.randint(1, 4)] for name in rng.choices(names, k=args.queries)]
+        slow_prefixes = prefixes[:args.database_queries]
+
+        report = {
+            "users": users,
+            "build_seconds": round(build_seconds, 2),
+            "index_bytes_per_user": round(retained / users),
+            "index_mb_per_million_users": round(retained / users * 10 ** 6 / 2 ** 20),
+            "limit": args.limit,
+            "index": latencies(lambda prefix: name_index.search(prefix, args.limit), prefixes),
+        }
+
+        # Renames through the index: one entry removed and one inserted
+        picks = rng.sample(list(name_index._by_id), min(args.queries, users))
+        report["index_rename"] = latencies(
+            lambda user_id: name_index.add(user_id, f"Renamed {user_id[:8]}"), picks
+        )
+
+        name_index.clear()
+        report["database_prefix"] = latencies(
+            lambda prefix: UserService.autocomplete_users(db, prefix, args.limit), slow_prefixes
+        )
+        report["search_fulltext"] = latencies(
+            lambda prefix: UserService.search_users(db, prefix, page_size=args.limit), slow_prefixes
+        )
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Startup time and throughput of `python -m app.serve` with 1 and N workers.
+
+For each worker count, starts the server, records the time until every
+worker has finished startup (including warm-up) and until the first
+response, then drives GET requests from client threads for a fixed time
+and reports throughput and latency percentiles as JSON. Seed the database
+first (benchmarks.seed); the server uses the environment's settings.
+
+    python -m benchmarks.bench_serve --workers 1,4 --duration 15 --clients 32
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks.run import percentile
+
+STARTED = "Application startup complete"
+
+def wait_for_startup(process: subprocess.Popen, workers: int, output: list, timeout: float) -> float:
+    """Seconds until `workers` startup-complete lines were logged."""
+    started = time.perf_counter()
+    ready = threading.Event()
+
+    def read():
+        count = 0
+        for line in process.stderr:
+            output.append(line)
+            if STARTED in line:
+                count += 1
+                if count == workers:
+                    ready.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    if not ready.wait(timeout):
+        raise RuntimeError("Server did not start:\n" + "".join(output[-20:]))
+    return time.perf_counter() - started
+
+def drive(base_url: str, path: str, clients: int, duration: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        mine, failed = [], 0
+        with httpx.Client(base_url=base_url, timeout=30) as http:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if http.get(path).status_code != 200:
+                    failed += 1
+                mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def run_server(workers: int, port: int, path: str, clients: int, duration: float) -> dict:
+    env = dict(os.environ, LOG_FORMAT="text", LOG_FILE="")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True
+    )
+    output = []
+    try:
+        ready = wait_for_startup(process, workers, output, timeout=120)
+        base_url = f"http://127.0.0.1:{port}"
+        first = httpx.get(base_url + path, timeout=30)
+        first.raise_for_status()
+        result = {
+            "workers": workers,
+            "startup_seconds": round(ready, 2),
+            "first_response_seconds": round(time.perf_counter() - started, 2),
+        }
+        result.update(drive(base_url, path, clients, duration))
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated worker counts")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/api/v1/users/?page_size=10&count=estimated")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per worker count")
+    args = parser.parse_args()
+
+    report = {
+        "cpu_count": os.cpu_count(),
+        "path": args.path,
+        "clients": args.clients,
+        "duration_seconds": args.duration,
+        "runs": [
+            run_server(int(workers), args.port, args.path, args.clients, args.duration)
+            for workers in dict.fromkeys(args.workers.split(","))
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Import and worker boot time.
+
+Each run starts a fresh interpreter, so module caches never carry over, and
+times the phases a worker goes through before serving: importing app.main,
+building the application, running its startup, and answering a first list
+request (which opens the first database connection). Separate runs time the
+imports Alembic and the jobs pay (app.database and the models). Reports
+the median of each phase in milliseconds as JSON.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BOOT = """
+import json, time
+started = time.perf_counter()
+phases = {}
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases[name] = (now - started) * 1000
+    started = now
+import app.main
+mark("import_app_main")
+application = app.main.app
+mark("build_app")
+from fastapi.testclient import TestClient
+client = TestClient(application)
+mark("import_test_client")
+client.__enter__()
+mark("startup")
+assert client.get("/api/v1/users/", params={"page_size": 1}).status_code == 200
+mark("first_request")
+client.__exit__(None, None, None)
+print(json.dumps(phases))
+"""
+
+IMPORTS = """
+import json, time
+started = time.perf_counter()
+import app.database
+database = (time.perf_counter() - started) * 1000
+import app.models.user, app.models.idempotency, app.models.archive
+print(json.dumps({"import_app_database": database, "import_models": (time.perf_counter() - started) * 1000}))
+"""
+
+def child(code: str) -> dict:
+    """Run code in a new interpreter; returns its phases plus the process wall time."""
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases["process"] = (time.perf_counter() - started) * 1000
+    return phases
+
+def run(runs: int) -> dict:
+    samples = {"boot": [child(BOOT) for _ in range(runs)], "imports": [child(IMPORTS) for _ in range(runs)]}
+    report = {"runs": runs, "python": sys.version.split()[0]}
+    for label, results in samples.items():
+        report[label] = {
+            phase: round(statistics.median(result[phase] for result in results), 1)
+            for phase in results[0]
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+    print(json.dumps(run(args.runs), indent=2))
+
+if __name__ == "__main__":
+    main()
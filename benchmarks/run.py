@@ -0,0 +1,175 @@
+"""
+Run scripted workloads against the users API and report latency as JSON.
+
+By default the app is driven in-process through Starlette's TestClient
+against DATABASE_URL, so nothing but the database is needed. Pass
+--base-url to measure a running server instead (including the HTTP stack).
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --rows 100000
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.run --requests 500 --output results/sqlite.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.seed import identity
+
+API = "/api/v1/users"
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def measure(call, count: int, concurrency: int) -> dict:
+    """Issue count calls of call(i) across concurrency threads and summarise latencies."""
+    latencies = []
+    errors = 0
+
+    def timed(i):
+        started = time.perf_counter()
+        response = call(i)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(timed, range(count)))
+    else:
+        outcomes = [timed(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+
+    for latency, status_code in outcomes:
+        latencies.append(latency * 1000)
+        errors += status_code >= 400
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+def build_workloads(client, page_size: int) -> dict:
+    """Scripted calls for every route in app/api/v1/users.py, keyed by workload name."""
+    first_page = client.get(f"{API}/?page_size=100").json()
+    total = first_page["total"]
+    if not total:
+        raise SystemExit("No users found; seed the database first (python -m benchmarks.seed)")
+    sample_ids = [user["id"] for user in first_page["data"]]
+    sample_emails = [user["email"] for user in first_page["data"]]
+    search_terms = sorted({user["name"].split()[-1][:4] for user in first_page["data"]})
+    name_prefixes = sorted({user["name"][:3] for user in first_page["data"]})
+
+    # The cursor workload seeks to the same depth as the deep OFFSET page
+    deep_page = max(2, total // page_size)
+    deep_cursor = client.get(f"{API}/?page={deep_page - 1}&page_size={page_size}").json()["next_cursor"] or ""
+
+    # Start created rows far above any seeded row number
+    created_ids = []
+    create_base = 10 ** 9 + int(time.time()) % 10 ** 6 * 1000
+    template = {
+        "name": "Bench User",
+        "date_of_birth": "1990-01-01",
+        "place_of_birth": "Mumbai",
+        "current_address": "1 Benchmark Road, Mumbai",
+        "permanent_address": "1 Benchmark Road, Mumbai",
+    }
+
+    def create(i):
+        response = client.post(f"{API}/", json={**template, **identity(create_base + i)})
+        if response.status_code == 201:
+            created_ids.append(response.json()["id"])
+        return response
+
+    def delete(i):
+        return client.delete(f"{API}/{created_ids[i % len(created_ids)]}")
+
+    pick = lambda items, i: items[i % len(items)]
+    return {
+        "create": create,
+        "get": lambda i: client.get(f"{API}/{pick(sample_ids, i)}"),
+        "update": lambda i: client.put(f"{API}/{pick(sample_ids, i)}", json={"name": f"Updated User {i}"}),
+        "list_shallow": lambda i: client.get(f"{API}/?page=1&page_size={page_size}"),
+        "list_deep_offset": lambda i: client.get(f"{API}/?page={deep_page}&page_size={page_size}"),
+        "list_deep_cursor": lambda i: client.get(f"{API}/?cursor={deep_cursor}&page_size={page_size}"),
+        "list_count_none": lambda i: client.get(f"{API}/?page=1&page_size={page_size}&count=none"),
+        "list_sparse": lambda i: client.get(f"{API}/?page=1&page_size={page_size}&fields=id,name,email"),
+        "search": lambda i: client.get(f"{API}/search/?q={pick(search_terms, i)}&page_size={page_size}"),
+        "search_prefix": lambda i: client.get(f"{API}/search/?q={pick(search_terms, i)}&mode=prefix&page_size={page_size}"),
+        # page_size users in one request, by email so the entity cache is not involved
+        "lookup": lambda i: client.post(f"{API}/lookup", json={"email": sample_emails[:page_size]}),
+        "autocomplete": lambda i: client.get(f"{API}/autocomplete?prefix={pick(name_prefixes, i)}&limit={page_size}"),
+        "changes": lambda i: client.get(f"{API}/changes?limit={page_size}"),
+        "delete": delete,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run API workloads and report throughput and latency")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per workload")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--workloads", help="Comma-separated subset of workloads to run")
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    if args.base_url:
+        import httpx
+        client = httpx.Client(base_url=args.base_url, timeout=60)
+        target = args.base_url
+    else:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app)
+        target = os.environ.get("DATABASE_URL", "").split("@")[-1]
+
+    workloads = build_workloads(client, args.page_size)
+    selected = args.workloads.split(",") if args.workloads else list(workloads)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "target": target,
+            "python": platform.python_version(),
+            "requests_per_workload": args.requests,
+            "concurrency": args.concurrency,
+            "page_size": args.page_size,
+        },
+        "workloads": {},
+    }
+    for name in selected:
+        call = workloads[name]
+        if name == "delete" and "create" not in report["workloads"]:
+            continue  # only rows created by this run are deleted
+        if name not in ("create", "delete"):
+            for i in range(5):
+                call(10 ** 6 + i)  # warm caches and connections
+        report["workloads"][name] = measure(call, args.requests, args.concurrency)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Seed the users table with synthetic data for benchmarks.
+
+Names and places come from Faker, but are drawn from small pre-generated
+pools so the seeder is bound by insert speed rather than by Faker. Unique
+identifiers are derived from the row number, so repeated runs with a
+different --start never collide.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --rows 1000000
+"""
+import argparse
+import random
+import string
+import time
+from datetime import date, timedelta
+
+from faker import Faker
+from sqlalchemy import insert
+
+def identity(n: int) -> dict:
+    """Unique, validator-compliant email, mobile, Aadhaar and PAN for row number n."""
+    letters = ""
+    value = n // 10000
+    for _ in range(5):
+        value, index = divmod(value, 26)
+        letters = string.ascii_uppercase[index] + letters
+    return {
+        "email": f"user{n}@bench{n % 97}.example.com",
+        "primary_mobile": str(6000000000 + n),
+        "aadhaar": f"{100000000000 + n:012d}",
+        "pan": f"{letters}{n % 10000:04d}Z",
+    }
+
+class RowFactory:
+    """Builds user rows for the users table from Faker-seeded pools."""
+
+    def __init__(self, seed: int = 42, pool_size: int = 1000):
+        fake = Faker("en_IN")
+        Faker.seed(seed)
+        self.random = random.Random(seed)
+        self.first_names = [fake.first_name() for _ in range(pool_size)]
+        self.last_names = [fake.last_name() for _ in range(pool_size)]
+        self.cities = [fake.city() for _ in range(pool_size // 10)]
+        self.addresses = [fake.address().replace("\n", ", ") for _ in range(pool_size)]
+
+    def row(self, n: int, user_id: str) -> dict:
+        pick = self.random.choice
+        email_domain = f"bench{n % 97}.example.com"
+        return {
+            "id": user_id,
+            "version": user_id,
+            "name": f"{pick(self.first_names)} {pick(self.last_names)}",
+            "email_domain": email_domain,
+            "date_of_birth": date(1960, 1, 1) + timedelta(days=self.random.randrange(15000)),
+            "place_of_birth": pick(self.cities),
+            "current_address": pick(self.addresses),
+            "permanent_address": pick(self.addresses),
+            **identity(n),
+        }
+
+def seed(rows: int, start: int = 0, batch: int = 5000) -> float:
+    """Insert rows users numbered from start; returns rows per second."""
+    from app.database import Base, SessionLocal, engine
+    from app.models.user import User
+    from app.utils.ids import new_user_id
+
+    Base.metadata.create_all(bind=engine)
+    factory = RowFactory(seed=start)
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        for offset in range(start, start + rows, batch):
+            payload = [factory.row(n, new_user_id()) for n in range(offset, min(offset + batch, start + rows))]
+            db.execute(insert(User), payload)
+            db.commit()
+    return rows / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic users for benchmarks")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--start", type=int, default=0, help="First row number, to extend an existing seed")
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+    rate = seed(args.rows, args.start, args.batch)
+    print(f"Seeded {args.rows} users at {rate:,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 -- SQL script to create test database and user
 CREATE DATABASE IF NOT EXISTS test_user_management;
 CREATE USER IF NOT EXISTS 'test'@'localhost' IDENTIFIED BY 'test';
-GRANT ALL PRIVILEGES ON test_user_management.* TO 'test'@'localhost';
+-- Also covers the per-worker databases of pytest -n (test_user_management_gw0, ...)
+GRANT ALL PRIVILEGES ON `test_user_management%`.* TO 'test'@'localhost';
 FLUSH PRIVILEGES;
 
 -- Verify setup
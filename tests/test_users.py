@@ -47,6 +47,30 @@ def test_create_user_underage(client, sample_user_data):
     response = client.post("/api/v1/users/", json=sample_user_data)
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
+def test_create_user_idempotency_key_replay(client, sample_user_data):
+    """Test retry with the same idempotency key returns the original user"""
+    sample_user_data["idempotency_key"] = "create-john-1"
+    first = client.post("/api/v1/users/", json=sample_user_data)
+    retry = client.post("/api/v1/users/", json=sample_user_data)
+    assert first.status_code == status.HTTP_201_CREATED
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.json()["id"] == first.json()["id"]
+    
+    sample_user_data["name"] = "Someone Else"
+    response = client.post("/api/v1/users/", json=sample_user_data)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_idempotency_key_not_replayed_for_deleted_user(client, sample_user_data):
+    """Test a retry after the user was deleted restores it instead of returning the deleted row"""
+    sample_user_data["idempotency_key"] = "create-john-2"
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    client.delete(f"/api/v1/users/{user_id}")
+    
+    retry = client.post("/api/v1/users/", json=sample_user_data)
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.json()["id"] == user_id
+    assert client.get(f"/api/v1/users/{user_id}").status_code == status.HTTP_200_OK
+
 def test_get_user_success(client, sample_user_data):
     """Test get user by ID"""
     create_response = client.post("/api/v1/users/", json=sample_user_data)
@@ -56,11 +80,48 @@ def test_get_user_success(client, sample_user_data):
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["id"] == user_id
 
+def test_get_user_etag_not_modified(client, sample_user_data):
+    """Test ETag revalidation and cache invalidation on update"""
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    
+    response = client.get(f"/api/v1/users/{user_id}")
+    etag = response.headers["ETag"]
+    response = client.get(f"/api/v1/users/{user_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    client.put(f"/api/v1/users/{user_id}", json={"name": "Jane Doe"})
+    response = client.get(f"/api/v1/users/{user_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["name"] == "Jane Doe"
+    assert response.headers["ETag"] != etag
+
 def test_get_user_not_found(client):
     """Test get non-existent user"""
     response = client.get("/api/v1/users/non-existent-id")
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
+def test_malformed_user_id(client, db):
+    """Test ids that are not UUIDs get 404 from the API and are refused by the column type"""
+    from sqlalchemy.exc import StatementError
+    from app.models.user import User
+    
+    assert client.put("/api/v1/users/not-a-uuid", json={"name": "Jane Doe"}).status_code == status.HTTP_404_NOT_FOUND
+    assert client.delete("/api/v1/users/not-a-uuid").status_code == status.HTTP_404_NOT_FOUND
+    with pytest.raises(StatementError):
+        db.query(User).filter(User.id == "not-a-uuid").first()
+
+def test_user_id_spellings_share_cache(client, sample_user_data):
+    """Test writes through another spelling of a user id invalidate the cached canonical entry"""
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    assert client.get(f"/api/v1/users/{user_id}").json()["name"] == "John Doe"
+
+    assert client.put(f"/api/v1/users/{user_id.upper()}", json={"name": "Jane Doe"}).status_code == status.HTTP_200_OK
+    assert client.get(f"/api/v1/users/{user_id}").json()["name"] == "Jane Doe"
+    assert client.get(f"/api/v1/users/{{{user_id}}}").json()["name"] == "Jane Doe"
+
+    assert client.delete(f"/api/v1/users/{user_id.upper()}").status_code == status.HTTP_200_OK
+    assert client.get(f"/api/v1/users/{user_id}").status_code == status.HTTP_404_NOT_FOUND
+
 def test_update_user_success(client, sample_user_data):
     """Test successful user update"""
     create_response = client.post("/api/v1/users/", json=sample_user_data)
@@ -73,6 +134,27 @@ def test_update_user_success(client, sample_user_data):
     assert response.json()["name"] == "Jane Doe"
     assert response.json()["current_address"] == "789 New St, Mumbai"
 
+def test_update_user_if_match(client, sample_user_data):
+    """Test optimistic locking with If-Match on update and delete"""
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    etag = client.get(f"/api/v1/users/{user_id}").headers["ETag"]
+    
+    response = client.put(f"/api/v1/users/{user_id}", json={"name": "Jane Doe"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+    
+    response = client.put(f"/api/v1/users/{user_id}", json={"name": "Stale Writer"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = client.delete(f"/api/v1/users/{user_id}", headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get(f"/api/v1/users/{user_id}").json()["name"] == "Jane Doe"
+    
+    response = client.delete(f"/api/v1/users/{user_id}", headers={"If-Match": new_etag})
+    assert response.status_code == status.HTTP_200_OK
+    response = client.put(f"/api/v1/users/{user_id}", json={"name": "Ghost"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
 def test_update_user_duplicate_email(client, sample_user_data):
     """Test update with duplicate email"""
     # Create first user
@@ -89,6 +171,26 @@ def test_update_user_duplicate_email(client, sample_user_data):
     # Try to update second user with first user's email
     response = client.put(f"/api/v1/users/{user_id}", json={"email": "john.doe@example.com"})
     assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Email already registered" in response.json()["detail"]
+
+def test_update_user_null_fields(client, db, sample_user_data):
+    """Test explicit nulls are rejected for required fields and other constraint errors are not duplicates"""
+    from fastapi import HTTPException
+    from app.services.user_service import UserService
+
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    for field in ["name", "email", "primary_mobile", "current_address", "is_active"]:
+        response = client.put(f"/api/v1/users/{user_id}", json={field: None})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, field
+
+    response = client.put(f"/api/v1/users/{user_id}", json={"secondary_mobile": None})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["secondary_mobile"] is None
+
+    with pytest.raises(HTTPException) as error:
+        UserService._conditional_update(db, user_id, {"primary_mobile": None})
+    assert error.value.status_code == status.HTTP_400_BAD_REQUEST
+    assert error.value.detail == "Invalid user data"
 
 def test_get_all_users_pagination(client, sample_user_data):
     """Test pagination in get all users"""
@@ -116,6 +218,24 @@ def test_get_all_users_pagination(client, sample_user_data):
     data = response.json()
     assert len(data["data"]) == 5
 
+def test_get_all_users_count_modes(client, sample_user_data):
+    """Test estimated and skipped totals"""
+    _create_users(client, sample_user_data, 5)
+    
+    data = client.get("/api/v1/users/?page_size=2&count=none").json()
+    assert data["count_mode"] == "none"
+    assert data["total"] is None
+    assert data["has_more"] is True
+    assert len(data["data"]) == 2
+    
+    data = client.get("/api/v1/users/?page=3&page_size=2&count=none").json()
+    assert data["has_more"] is False
+    
+    data = client.get("/api/v1/users/?page_size=2&count=estimated").json()
+    assert data["count_mode"] == "estimated"
+    assert data["total"] == 5
+    assert data["total_pages"] == 3
+
 def test_soft_delete_user(client, sample_user_data):
     """Test soft delete functionality"""
     create_response = client.post("/api/v1/users/", json=sample_user_data)
@@ -129,11 +249,654 @@ def test_soft_delete_user(client, sample_user_data):
     response = client.get(f"/api/v1/users/{user_id}")
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
+def test_archive_and_restore_deleted_user(client, db, sample_user_data):
+    """Test retention moves old soft-deleted users to the archive and re-registration restores them"""
+    from datetime import datetime, timedelta
+    from app.models.archive import UserArchive
+    from app.models.user import User
+    from app.services.retention_service import RetentionService
+
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    client.delete(f"/api/v1/users/{user_id}")
+    assert RetentionService.archive_deleted_users(db, days=1, pause=0) == 0
+
+    db.query(User).update({User.deleted_at: datetime.utcnow() - timedelta(days=2)})
+    db.commit()
+    assert RetentionService.archive_deleted_users(db, days=1, batch_size=1, pause=0) == 1
+    db.expire_all()
+    assert db.query(User).count() == 0
+    assert db.query(UserArchive).count() == 1
+
+    sample_user_data["name"] = "John Returned"
+    response = client.post("/api/v1/users/", json=sample_user_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] == user_id
+    assert response.json()["name"] == "John Returned"
+    assert db.query(UserArchive).count() == 0
+
+def test_restored_user_in_change_feed(client, db, sample_user_data):
+    """Test restoring an archived user is reported by the change feed after earlier changes"""
+    from datetime import timedelta
+    from sqlalchemy import func, select, update
+    from app.models.user import User
+    from app.services.retention_service import RetentionService
+
+    user_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    client.delete(f"/api/v1/users/{user_id}")
+    now = db.scalar(select(func.now()))
+    db.execute(update(User).values(updated_at=now - timedelta(days=200), deleted_at=now - timedelta(days=200)))
+    assert RetentionService.archive_deleted_users(db, days=1, pause=0) == 1
+
+    other = dict(sample_user_data, name="Priya Sharma", email="priya@example.com", primary_mobile="9876543211",
+                 aadhaar="123456789013", pan="ABCDE1234G")
+    priya = client.post("/api/v1/users/", json=other).json()
+    db.execute(update(User).where(User.id == priya["id"]).values(created_at=now - timedelta(minutes=2),
+                                                                  updated_at=now - timedelta(minutes=2)))
+    db.commit()
+    seen = client.get("/api/v1/users/changes").json()
+    assert [change["id"] for change in seen["data"]] == [priya["id"]]
+
+    sample_user_data["name"] = "John Returned"
+    assert client.post("/api/v1/users/", json=sample_user_data).json()["id"] == user_id
+    # Age every change past CHANGES_SAFETY_LAG_SECONDS, keeping their order
+    for row in db.execute(select(User.id, User.updated_at)).all():
+        db.execute(update(User).where(User.id == row.id).values(updated_at=row.updated_at - timedelta(minutes=1)))
+    db.commit()
+
+    changes = client.get("/api/v1/users/changes", params={"since": seen["next_cursor"]}).json()
+    assert [(change["change"], change["id"], change["user"]["name"]) for change in changes["data"]] == [
+        ("updated", user_id, "John Returned")
+    ]
+
+def test_optimize_keeps_sqlite_search_index(tmp_path, sample_user_data):
+    """Test --optimize on SQLite rebuilds users_fts so search matches the vacuumed rows"""
+    from sqlalchemy import create_engine, delete, text
+    from sqlalchemy.orm import Session
+    from app.database import Base
+    from app.jobs.archive import optimize_users_table
+    from app.models.user import User
+    from app.schemas.user import UserCreate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'optimize.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        for i in range(20):
+            user = UserCreate(**dict(sample_user_data, name=f"Person{i:02d}", email=f"user{i}@example.com",
+                                     primary_mobile=f"987654{i:04d}", aadhaar=f"12345678{i:04d}", pan=f"ABCDE{1230+i:04d}F"))
+            db.add(User(**user.model_dump(exclude={"idempotency_key"})))
+        db.commit()
+        db.execute(delete(User).where(User.name < "Person10"))
+        db.commit()
+    with engine.begin() as conn:
+        # Stand in for rowids VACUUM is allowed to renumber: an index entry out of step with users
+        conn.execute(text(
+            "INSERT INTO users_fts(users_fts, rowid, name, email) "
+            "SELECT 'delete', rowid, name, email FROM users WHERE name = 'Person15'"
+        ))
+
+    optimize_users_table(engine)
+    with engine.connect() as conn:
+        matched = conn.execute(text(
+            "SELECT users.name FROM users_fts JOIN users ON users.rowid = users_fts.rowid "
+            "WHERE users_fts MATCH 'Person15'"
+        )).scalars().all()
+    assert matched == ["Person15"]
+
+def _create_users(client, sample_user_data, count):
+    """Create count users with unique identifiers, returning their ids"""
+    ids = []
+    for i in range(count):
+        user_data = sample_user_data.copy()
+        user_data["email"] = f"user{i}@example.com"
+        user_data["primary_mobile"] = f"987654{i:04d}"
+        user_data["aadhaar"] = f"12345678{i:04d}"
+        user_data["pan"] = f"ABCDE{1230+i:04d}F"
+        ids.append(client.post("/api/v1/users/", json=user_data).json()["id"])
+    return ids
+
+def test_get_all_users_cursor_pagination(client, sample_user_data):
+    """Test keyset pagination walks every user exactly once"""
+    created_ids = _create_users(client, sample_user_data, 15)
+    
+    seen = []
+    response = client.get("/api/v1/users/?page_size=4")
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        seen.extend(user["id"] for user in data["data"])
+        if not data["next_cursor"]:
+            break
+        response = client.get(f"/api/v1/users/?page_size=4&cursor={data['next_cursor']}")
+    
+    assert len(seen) == 15
+    assert set(seen) == set(created_ids)
+
+def test_get_all_users_invalid_cursor(client):
+    """Test malformed cursor is rejected"""
+    response = client.get("/api/v1/users/?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_bulk_create_users_ndjson(client, sample_user_data):
+    """Test bulk NDJSON upload reports each row"""
+    import json
+    client.post("/api/v1/users/", json=sample_user_data)
+    
+    second = dict(sample_user_data, email="second@example.com", primary_mobile="9876543211",
+                  aadhaar="123456789013", pan="ABCDE1234G")
+    invalid = dict(sample_user_data, email="third@example.com", pan="INVALID")
+    body = "\n".join(json.dumps(row) for row in [sample_user_data, second, invalid, second]) + "\n"
+    
+    response = client.post("/api/v1/users/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 4
+    assert data["created"] == 1
+    statuses = [result["status"] for result in data["results"]]
+    assert statuses == ["failed", "created", "failed", "failed"]
+    assert "Email already registered" in data["results"][0]["error"]
+    
+    response = client.get(f"/api/v1/users/{data['results'][1]['id']}")
+    assert response.json()["email"] == "second@example.com"
+
+def test_bulk_create_users_csv(client, sample_user_data):
+    """Test bulk CSV upload"""
+    fields = list(sample_user_data)
+    lines = [",".join(fields)]
+    for i in range(3):
+        row = dict(sample_user_data, email=f"user{i}@example.com", primary_mobile=f"987654{i:04d}",
+                   aadhaar=f"12345678{i:04d}", pan=f"ABCDE{1230+i:04d}F",
+                   current_address="12 Main Street Mumbai", permanent_address="34 Oak Street Mumbai")
+        lines.append(",".join(row[field] for field in fields))
+    
+    response = client.post("/api/v1/users/bulk", content="\n".join(lines), headers={"Content-Type": "text/csv"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["created"] == 3
+    assert client.get("/api/v1/users/").json()["total"] == 3
+
+def test_iter_lines_across_chunks():
+    """Test lines and multi-byte characters split across chunks are reassembled"""
+    from app.utils.ingest import iter_lines
+
+    data = "first\nsécond line spanning chunks\n\nlast ✓".encode()
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+    assert list(iter_lines(chunks)) == ["first\n", "sécond line spanning chunks\n", "\n", "last ✓"]
+    assert list(iter_lines([data])) == list(iter_lines(chunks))
+    assert list(iter_lines([b"a\n"])) == ["a\n"]
+
+def test_bulk_create_restores_deleted_users(client, db, sample_user_data):
+    """Test bulk upload restores soft-deleted and archived users like POST /users/"""
+    import json
+    from datetime import datetime, timedelta
+    from app.models.user import User
+    from app.services.retention_service import RetentionService
+
+    deleted_id = client.post("/api/v1/users/", json=sample_user_data).json()["id"]
+    client.delete(f"/api/v1/users/{deleted_id}")
+    archived = dict(sample_user_data, email="archived@example.com", primary_mobile="9876543211",
+                    aadhaar="123456789013", pan="ABCDE1234G")
+    archived_id = client.post("/api/v1/users/", json=archived).json()["id"]
+    client.delete(f"/api/v1/users/{archived_id}")
+    db.query(User).filter(User.id == archived_id).update({User.deleted_at: datetime.utcnow() - timedelta(days=2)})
+    db.commit()
+    assert RetentionService.archive_deleted_users(db, days=1, pause=0) == 1
+
+    rows = [dict(sample_user_data, name="John Returned"), dict(archived, name="Archie Returned")]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n"
+    response = client.post("/api/v1/users/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    data = response.json()
+    assert data["created"] == 2
+    assert [result["id"] for result in data["results"]] == [deleted_id, archived_id]
+    assert client.get(f"/api/v1/users/{deleted_id}").json()["name"] == "John Returned"
+    assert client.get(f"/api/v1/users/{archived_id}").json()["name"] == "Archie Returned"
+
+@pytest.mark.committed
+def test_search_users_modes(client, sample_user_data):
+    """Test full-text, prefix and email-domain search"""
+    client.post("/api/v1/users/", json=sample_user_data)
+    other = dict(sample_user_data, name="Priya Sharma", email="priya@corp.in", primary_mobile="9876543211",
+                 aadhaar="123456789013", pan="ABCDE1234G")
+    client.post("/api/v1/users/", json=other)
+    
+    response = client.get("/api/v1/users/search/?q=sharm")
+    assert [user["name"] for user in response.json()["data"]] == ["Priya Sharma"]
+    
+    response = client.get("/api/v1/users/search/?q=sharm&mode=prefix")
+    assert response.json()["total"] == 0
+    response = client.get("/api/v1/users/search/?q=john&mode=prefix")
+    assert [user["name"] for user in response.json()["data"]] == ["John Doe"]
+    
+    response = client.get("/api/v1/users/search/?q=@corp&mode=domain")
+    assert [user["email"] for user in response.json()["data"]] == ["priya@corp.in"]
+    
+    response = client.put(f"/api/v1/users/{client.get('/api/v1/users/search/?q=priya').json()['data'][0]['id']}",
+                          json={"name": "Priya Verma"})
+    assert client.get("/api/v1/users/search/?q=sharm").json()["total"] == 0
+    assert client.get("/api/v1/users/search/?q=verma").json()["total"] == 1
+
+def test_sparse_fieldsets(client, sample_user_data):
+    """Test fields= projections on get, list and search"""
+    ids = _create_users(client, sample_user_data, 3)
+    
+    response = client.get("/api/v1/users/?fields=id,name&page_size=2")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [set(user) for user in data["data"]] == [{"id", "name"}, {"id", "name"}]
+    assert data["total"] == 3
+    assert data["next_cursor"]
+    
+    response = client.get(f"/api/v1/users/?fields=id,email&cursor={data['next_cursor']}")
+    assert response.json()["data"] == [{"id": ids[0], "email": "user0@example.com"}]
+    
+    response = client.get(f"/api/v1/users/{ids[1]}?fields=email")
+    assert response.json() == {"email": "user1@example.com"}
+    assert response.headers["ETag"]
+    
+    response = client.get("/api/v1/users/search/?q=John&fields=name")
+    assert {user["name"] for user in response.json()["data"]} == {"John Doe"}
+    
+    response = client.get("/api/v1/users/?fields=id,aadhaar_hash")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_fast_json_responses_match_response_model(client, sample_user_data, monkeypatch):
+    """Test pre-encoded reads produce the same JSON as response_model serialization"""
+    from app.config import get_settings
+    ids = _create_users(client, sample_user_data, 3)
+    urls = ["/api/v1/users/?page_size=2", "/api/v1/users/?fields=name,created_at",
+            "/api/v1/users/search/?q=John", f"/api/v1/users/{ids[0]}"]
+    
+    monkeypatch.setattr(get_settings(), "FAST_JSON_RESPONSES", True)
+    fast = [client.get(url).json() for url in urls]
+    monkeypatch.setattr(get_settings(), "FAST_JSON_RESPONSES", False)
+    slow = [client.get(url).json() for url in urls]
+    assert fast == slow
+
+def test_export_users(client, sample_user_data):
+    """Test NDJSON and CSV export with column selection"""
+    import json
+    ids = _create_users(client, sample_user_data, 3)
+    client.delete(f"/api/v1/users/{ids[0]}")
+    
+    response = client.get("/api/v1/users/export?fields=id,email")
+    assert response.status_code == status.HTTP_200_OK
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["id"] for row in rows) == sorted(ids[1:])
+    assert set(rows[0]) == {"id", "email"}
+    
+    response = client.get("/api/v1/users/export?format=csv&fields=email,date_of_birth")
+    lines = response.text.splitlines()
+    assert lines[0] == "email,date_of_birth"
+    assert len(lines) == 3
+    assert lines[1].endswith(",1990-01-01")
+    
+    response = client.get("/api/v1/users/export?fields=id,password")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 def test_health_check(client):
     """Test health check endpoint"""
     response = client.get("/health")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "healthy"}
 
+def test_logging_queue_drops_and_samples():
+    """Test the log queue drops instead of blocking and sampling keeps warnings"""
+    import logging
+    import queue
+    from app.log import DroppingQueueHandler, SamplingFilter, PIIHash
+    from app.metrics import get_sample_value
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.addFilter(SamplingFilter({"app.services": 0.0}))
+    logger = logging.getLogger("app.services.sampled")
+    before = get_sample_value("log_records_dropped_total") or 0
+
+    handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 0, "dropped by sampling", (), None))
+    assert handler.queue.qsize() == 0
+    for _ in range(2):
+        handler.handle(logger.makeRecord(logger.name, logging.WARNING, __file__, 0, "user %s", (PIIHash("a@b.c", "s"),), None))
+    assert handler.queue.qsize() == 1
+    assert get_sample_value("log_records_dropped_total") == before + 1
+    assert "a@b.c" not in handler.queue.get_nowait().getMessage()
+
+def test_setup_logging_replaces_listener(tmp_path):
+    """Test reconfiguring logging stops the previous listener and closes its file"""
+    import logging
+    import threading
+    from app.config import get_settings
+    from app.log import setup_logging
+    
+    threads = threading.active_count()
+    settings = get_settings().model_copy(update={"LOG_FILE": str(tmp_path / "first.log")})
+    first = setup_logging(settings)
+    setup_logging(settings.model_copy(update={"LOG_FILE": ""}))
+    # Each listener runs one thread; replaced listeners must not leave theirs behind
+    assert threading.active_count() == threads
+    assert first.handlers[0].stream is None
+    
+    logging.getLogger("app").warning("after reconfiguration")
+    assert "after reconfiguration" not in (tmp_path / "first.log").read_text()
+
+def test_metrics_endpoint(client, sample_user_data):
+    """Test request and SQL metrics are exposed per route template and worker"""
+    import os
+    user_id = _create_users(client, sample_user_data, 1)[0]
+    client.get(f"/api/v1/users/{user_id}")
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    pid = f'pid="{os.getpid()}"'
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/users/{user_id}",status="200",' + pid + '}' in body
+    assert 'http_request_db_statements_count{method="POST",route="/api/v1/users/",' + pid + '}' in body
+    assert 'db_statements_total{' + pid + '}' in body
+    assert user_id not in body
+
+def test_replica_routing(tmp_path, sample_user_data):
+    """Test reads go to a replica, writes and pinned sessions to the primary"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models.user import User
+    from app.routing import ReplicaSet, recent_writes, routing_session_class
+    from app.schemas.user import UserCreate
+    from app.services.user_service import UserService
+
+    primary, replica, spare = (create_engine(f"sqlite:///{tmp_path / name}.db") for name in ("primary", "replica", "spare"))
+    for bind in (primary, replica, spare):
+        Base.metadata.create_all(bind=bind)
+    replicas = ReplicaSet([replica, spare])
+    assert [replicas.choose() for _ in range(3)] == [replica, spare, replica]
+    Session = sessionmaker(autoflush=False, class_=routing_session_class(primary, ReplicaSet([replica])))
+
+    with Session() as db:
+        user = UserService.create_user(db, UserCreate(**sample_user_data))
+        user_id = user.id
+        assert db.info['use_primary']
+        assert db.get(User, user_id) is not None
+
+    with Session() as db:
+        assert db.get(User, user_id) is None
+    with Session() as db:
+        db.info['use_primary'] = True
+        assert db.get(User, user_id) is not None
+
+    # A cache miss right after this worker's write reads the primary
+    with Session() as db:
+        assert UserService.get_user_cached(db, str(user_id))["version"] == user.version
+    recent_writes.clear()
+
+def test_pool_sizing_and_leak_detection(tmp_path, caplog):
+    """Test pool sizes follow the connection budget and long-held connections are reported"""
+    import os
+    from types import SimpleNamespace
+    from sqlalchemy import create_engine
+    from app.metrics import render_metrics
+    from app.pool import MONITORS, PoolMonitor, TimedQueuePool, pool_options
+
+    settings = SimpleNamespace(
+        DB_CONNECTION_BUDGET=150, WEB_CONCURRENCY=1, DB_POOL_SIZE=None, DB_MAX_OVERFLOW=None,
+        DB_POOL_TIMEOUT=30, DB_POOL_RECYCLE=3600
+    )
+    assert (pool_options(settings)["pool_size"], pool_options(settings)["max_overflow"]) == (50, 100)
+    settings.WEB_CONCURRENCY = 6
+    assert (pool_options(settings)["pool_size"], pool_options(settings)["max_overflow"]) == (8, 17)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_logging_name="leaktest")
+    monitor = PoolMonitor(engine, "leaktest", leak_threshold=0)
+    try:
+        connection = engine.connect()
+        assert monitor.stats()["checked_out"] == 1
+        assert 'db_pool_checked_out{pool="leaktest",pid="' + str(os.getpid()) + '"} 1' in render_metrics()
+        with caplog.at_level("WARNING", logger="app.pool"):
+            assert monitor.report_leaks() == 1
+            assert monitor.report_leaks() == 1
+        reports = [record.getMessage() for record in caplog.records if "leaktest" in record.getMessage()]
+        assert len(reports) == 1
+        assert "test_pool_sizing_and_leak_detection" in reports[0]
+        connection.close()
+        assert monitor.stats()["checked_out"] == 0
+        assert 'db_pool_long_held_total{pool="leaktest",pid="' + str(os.getpid()) + '"} 1' in render_metrics()
+    finally:
+        MONITORS.remove(monitor)
+
+def test_index_advisor(db):
+    """Test the index advisor flags overlapping indexes and finds none on the model"""
+    from app.jobs.indexes import analyze, redundant_indexes
+    from app.models.user import User
+
+    def index(name, columns, unique=False):
+        return {"name": name, "column_names": columns, "unique": unique, "fulltext": False}
+
+    legacy = [
+        index("ix_users_email", ["email"], unique=True),
+        index("idx_active_email", ["is_deleted", "email"]),
+        index("ix_users_name", ["name"]),
+        index("idx_name_search", ["name"]),
+        index("ix_users_is_deleted", ["is_deleted"]),
+        index("idx_deleted_at", ["is_deleted", "deleted_at"]),
+    ]
+    found = {found_index["name"]: reason for found_index, reason in redundant_indexes(legacy, "users")}
+    assert found == {
+        "idx_active_email": "lookups are answered by unique ix_users_email",
+        "idx_name_search": "duplicate of ix_users_name",
+        "ix_users_is_deleted": "left prefix of idx_deleted_at",
+    }
+
+    report = analyze(db.get_bind(), User.__table__)
+    assert report["statements"]
+    assert report["redundant"] == []
+    assert report["missing"] == []
+    assert not report["not_in_database"]
+
+def test_create_app_builds_database_in_lifespan(tmp_path):
+    """Test create_app defers the engines to startup and disposes them on shutdown"""
+    from fastapi.testclient import TestClient
+    from app import database
+    from app.config import get_settings
+    from app.main import create_app
+    from app.pool import MONITORS
+
+    settings = get_settings().model_copy(update={
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'factory.db'}", "SERVER_WARMUP": False
+    })
+    application = create_app(settings)
+    assert database._database is None or database._database.settings is not settings
+
+    with TestClient(application) as client:
+        current = database.get_database()
+        assert current.settings is settings
+        assert database.engine is current.engine
+        assert str(current.engine.url).endswith("factory.db")
+        database.Base.metadata.create_all(bind=current.engine)
+        response = client.get("/api/v1/users/")
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+
+    assert database._database is None
+    assert not set(current.monitors) & set(MONITORS)
+
+def test_create_app_uses_its_own_settings(tmp_path, sample_user_data):
+    """Test two apps with different settings in one process each use their own database, mode and limits"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from app import database
+    from app.config import get_settings
+    from app.main import create_app
+
+    def app_settings(name, **updates):
+        url = f"sqlite:///{tmp_path / name}.db"
+        engine = create_engine(url)
+        database.Base.metadata.create_all(bind=engine)
+        engine.dispose()
+        return get_settings().model_copy(update={
+            "DATABASE_URL": url, "SERVER_WARMUP": False, "AUTOCOMPLETE_ENABLED": False, **updates
+        })
+
+    small = app_settings("small", DEFAULT_PAGE_SIZE=2, MAX_PAGE_SIZE=3, LOOKUP_MAX_VALUES=2, FAST_JSON_RESPONSES=False)
+    large = app_settings("large", DATABASE_ASYNC=True, MAX_PAGE_SIZE=200)
+
+    with TestClient(create_app(small)) as small_client, TestClient(create_app(large)) as large_client:
+        large_database = large_client.app.state.database
+        assert database.get_database() is large_database
+        _create_users(small_client, sample_user_data, 3)
+
+        page = small_client.get("/api/v1/users/").json()
+        assert (page["total"], len(page["data"])) == (3, 2)
+        assert small_client.get("/api/v1/users/?page_size=4").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert small_client.get("/api/v1/users/autocomplete?prefix=J&limit=4").status_code == 422
+        emails = {"email": ["a@example.com", "b@example.com", "c@example.com"]}
+        assert small_client.post("/api/v1/users/lookup", json=emails).status_code == status.HTTP_400_BAD_REQUEST
+        assert large_client.post("/api/v1/users/lookup", json=emails).json()["missed"] == 3
+
+        assert large_client.get("/api/v1/users/?page_size=150").json()["total"] == 0
+        assert large_database.async_engine.pool.checkedin() == 1
+        assert large_database.engine.pool.checkedin() == 0
+
+def test_serve_options_and_warm_up(tmp_path):
+    """Test the server options come from settings and workers warm up before serving"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from app import database
+    from app.cache.count_cache import count_cache
+    from app.config import get_settings
+    from app.main import create_app
+    from app.serve import uvicorn_options
+
+    settings = get_settings().model_copy(update={
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'warm.db'}", "DB_POOL_SIZE": 3, "SERVER_LOOP": "asyncio",
+        "SERVER_KEEPALIVE_SECONDS": 15
+    })
+    options = uvicorn_options(settings, workers=4)
+    assert (options["workers"], options["loop"], options["timeout_keep_alive"]) == (4, "asyncio", 15)
+
+    engine = create_engine(settings.DATABASE_URL)
+    database.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    count_cache.clear()
+
+    with TestClient(create_app(settings)):
+        pool = database.get_database().engine.pool
+        assert pool.checkedin() == 3
+        assert count_cache.backend.get("users")[0]
+
+def test_lookup_users(client, sample_user_data, monkeypatch):
+    """Test batch lookup by id and identifiers keeps input order and marks misses"""
+    from app.api.v1.users import lookup_users
+    from app.config import get_settings
+    from app.routing import is_write
+
+    first = client.post("/api/v1/users/", json=sample_user_data).json()
+    other = dict(sample_user_data, name="Priya Sharma", email="Priya@Corp.in", primary_mobile="9876543211",
+                 aadhaar="123456789013", pan="ABCDE1234G")
+    second = client.post("/api/v1/users/", json=other).json()
+    client.delete(f"/api/v1/users/{second['id']}")
+    missing_id = "00000000-0000-7000-8000-000000000000"
+
+    response = client.post("/api/v1/users/lookup", json={
+        "id": [second["id"], first["id"].upper(), missing_id, first["id"], "not-a-uuid"],
+        "email": ["john.doe@EXAMPLE.com", "nobody@example.com"],
+        "pan": ["abkde1234f"],
+        "aadhaar": ["123456789013"],
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert [(entry["value"], entry["found"]) for entry in result["id"]] == [
+        (second["id"], False), (first["id"].upper(), True), (missing_id, False), (first["id"], True), ("not-a-uuid", False)
+    ]
+    assert result["id"][1]["user"]["email"] == "john.doe@example.com"
+    assert [entry["found"] for entry in result["email"]] == [True, False]
+    assert result["pan"][0]["user"]["id"] == first["id"]
+    assert result["aadhaar"][0]["found"] is False
+    assert result["primary_mobile"] == []
+    assert (result["found"], result["missed"]) == (4, 5)
+
+    monkeypatch.setattr(get_settings(), "LOOKUP_MAX_VALUES", 2)
+    assert client.post("/api/v1/users/lookup", json={"id": [missing_id] * 3}).status_code == 400
+    assert not is_write({"method": "POST", "endpoint": lookup_users})
+
+def test_autocomplete_users(client, db, sample_user_data, monkeypatch):
+    """Test name autocomplete from the database, then from the incrementally maintained index"""
+    from sqlalchemy import update
+    from app.config import Settings
+    from app.models.user import User
+    from app.services.autocomplete import NameIndex, name_index
+
+    assert not Settings.model_fields["AUTOCOMPLETE_ENABLED"].default
+
+    john = client.post("/api/v1/users/", json=sample_user_data).json()
+    response = client.get("/api/v1/users/autocomplete?prefix=joh")
+    assert response.status_code == 200
+    assert response.json()["data"] == [{"id": john["id"], "name": "John Doe"}]
+
+    assert name_index.build(db, max_entries=100)
+    other = dict(sample_user_data, name="Jöhanna  Smith", email="johanna@example.com", primary_mobile="9876543211",
+                 aadhaar="123456789013", pan="ABCDE1234G")
+    johanna = client.post("/api/v1/users/", json=other).json()
+    suggest = lambda prefix: [match["name"] for match in client.get(
+        "/api/v1/users/autocomplete", params={"prefix": prefix}
+    ).json()["data"]]
+    searches = []
+    monkeypatch.setattr(name_index, "search", lambda *args: searches.append(args) or NameIndex.search(name_index, *args))
+    assert suggest("JOH") == ["Jöhanna  Smith", "John Doe"]
+    assert len(searches) == 1
+    assert suggest("johanna s") == ["Jöhanna  Smith"]
+    assert suggest("john ") == ["John Doe"]
+
+    client.put(f"/api/v1/users/{john['id']}", json={"name": "Rahul Verma"})
+    client.delete(f"/api/v1/users/{johanna['id']}")
+    assert suggest("joh") == []
+    assert suggest("rahul v") == ["Rahul Verma"]
+
+    # Writes by another worker arrive through sync()
+    db.execute(update(User).where(User.id == john["id"]).values(name="Rohan Verma"))
+    assert name_index.sync(db) >= 1
+    assert suggest("r") == ["Rohan Verma"]
+    assert client.get("/api/v1/users/autocomplete?prefix=r&limit=0").status_code == 422
+
+    assert not NameIndex().build(db, max_entries=0)
+
+def test_change_feed(client, db, sample_user_data):
+    """Test the change feed pages updates and tombstones by cursor and holds back recent changes"""
+    from datetime import timedelta
+    from sqlalchemy import func, select, update
+    from app.models.user import User
+
+    john = client.post("/api/v1/users/", json=sample_user_data).json()
+    other = dict(sample_user_data, name="Priya Sharma", email="priya@example.com", primary_mobile="9876543211",
+                 aadhaar="123456789013", pan="ABCDE1234G")
+    priya = client.post("/api/v1/users/", json=other).json()
+    client.put(f"/api/v1/users/{john['id']}", json={"name": "Rahul Verma"})
+    client.delete(f"/api/v1/users/{priya['id']}")
+
+    # Age the changes past CHANGES_SAFETY_LAG_SECONDS
+    base = db.scalar(select(func.now())) - timedelta(minutes=1)
+    db.execute(update(User).where(User.id == priya["id"]).values(updated_at=base))
+    db.execute(update(User).where(User.id == john["id"]).values(updated_at=base + timedelta(seconds=1)))
+    newest = dict(sample_user_data, name="Anil Rao", email="anil@example.com", primary_mobile="9876543212",
+                  aadhaar="123456789014", pan="ABCDE1234H")
+    anil = client.post("/api/v1/users/", json=newest).json()
+
+    first = client.get("/api/v1/users/changes?limit=1").json()
+    assert [(change["change"], change["id"], change["user"]) for change in first["data"]] == [
+        ("deleted", priya["id"], None)
+    ]
+    assert first["has_more"] is True
+
+    second = client.get("/api/v1/users/changes", params={"since": first["next_cursor"]}).json()
+    assert [(change["change"], change["user"]["name"]) for change in second["data"]] == [("updated", "Rahul Verma")]
+    assert second["has_more"] is False
+
+    # Anil is younger than the safety lag; an empty batch returns the same cursor
+    idle = client.get("/api/v1/users/changes", params={"since": second["next_cursor"]}).json()
+    assert idle["data"] == [] and idle["next_cursor"] == second["next_cursor"]
+
+    aged = base + timedelta(seconds=2)
+    db.execute(update(User).where(User.id == anil["id"]).values(created_at=aged, updated_at=aged))
+    third = client.get("/api/v1/users/changes", params={"since": second["next_cursor"]}).json()
+    assert [(change["change"], change["id"]) for change in third["data"]] == [("created", anil["id"])]
+
+    assert client.get("/api/v1/users/changes?since=not-a-cursor").status_code == 400
+    assert client.get("/api/v1/users/changes?limit=100000").status_code == 422
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])